@@ -1,27 +1,112 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, g, make_response, jsonify, Response
 import sqlite3
+import db
 import os
 import threading
-from mcstatus import JavaServer
-from scanner import run_loop
+import hashlib
+import base64
+from datetime import datetime, timezone
+from functools import wraps
+from server_status import read_status
+from scanner import run_loop, rank_tier, mining_log, SOURCE_NAMES, RANK_TIERS
+from registry import HARVEST, LEADERBOARDS, format_value
+from history import query_trend, HOUR, DAY, HISTORY_DAILY_DAYS
+import queries
+import events
+import metrics
+import time
 from init_db import init_system
 import math
 
 app = Flask(__name__)
+app.json.compact = True # API clients poll often; no indentation even in debug
 DB_NAME = os.getenv("DB_PATH", "corex.db")
 
+# Prepared statements kept per connection; the routes use a few dozen distinct queries
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", 256))
+
+# One read-only connection per worker thread, reused across requests
+_local = threading.local()
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Returns this thread's connection, bound to the current app context"""
+    if 'db' not in g:
+        conn = getattr(_local, 'conn', None)
+        if conn is None:
+            conn = db.connect(DB_NAME, readonly=True, cached_statements=DB_STATEMENT_CACHE)
+            conn.row_factory = sqlite3.Row
+            _local.conn = conn
+        g.db = conn
+    return g.db
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    conn = g.pop('db', None)
+    if conn is None:
+        return
+    if isinstance(exc, sqlite3.Error):
+        # Don't hand a possibly broken connection to the next request
+        _local.conn = None
+        conn.close()
+    elif conn.in_transaction:
+        conn.rollback()
+
+@app.before_request
+def start_request_timer():
+    if not request.environ.get('corex.export'): # Pages rendered by export.py in the scanner aren't web traffic
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched" # Raw paths would explode the label set
+        metrics.observe("corex_http_request_duration_seconds", time.perf_counter() - started, route=route, method=request.method, status=str(response.status_code))
+        metrics.flush()
+    return response
+
+# Rendered pages kept per worker; each entry is only valid for the scan generation it was built from
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", 256))
+
+page_cache = queries.GenerationCache(PAGE_CACHE_SIZE)
+
+def get_scan_generation():
+    return queries.get_scan_generation(get_db_connection())
+
+def cached_page(view):
+    """Serves the view from page_cache until the scanner commits new data.
+
+    Responses carry an ETag and Last-Modified, so repeat visitors get a 304.
+    The server status is part of the tag because the dashboard shows it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        generation, generation_at = get_scan_generation()
+        tag = (generation, get_server_status())
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+
+        page = page_cache.get(key, tag)
+        if page is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            page = (body, hashlib.md5(body).hexdigest(), response.mimetype)
+            page_cache.put(key, tag, page)
+
+        body, etag, mimetype = page
+        response = make_response(body)
+        response.mimetype = mimetype
+        response.set_etag(etag)
+        if generation_at:
+            response.last_modified = datetime.fromtimestamp(generation_at, timezone.utc)
+        response.cache_control.no_cache = True # Always revalidate; a 304 is cheap
+        return response.make_conditional(request)
+    return wrapper
 
 def get_server_status():
-    try:
-        server = JavaServer.lookup("localhost:25565", timeout=1)
-        status = server.status()
-        return f"Online ({status.players.online}/{status.players.max} Players)"
-    except Exception:
-        return "Offline"
+    # Filled in by the scanner's background poller; never blocks the request
+    return read_status(get_db_connection())
 
 def get_server_era(total_score):
     if total_score >= 25000:
@@ -46,254 +131,271 @@ def get_player_era(score):
     else: return "stone-age"
 
 def get_player_rank(score):
-    if score >= 2000:
-        return {"current_title": "Warlord", "image_path": "static/ranks/warlord.svg", "next_title": "Max Rank", "progress_percent": 100, "current_score": score, "next_rank_score": None}
-    elif score >= 1000:
-        progress = int(((score - 1000) / 1000) * 100)
-        return {"current_title": "Veteran", "image_path": "static/ranks/veteran.svg", "next_title": "Warlord", "progress_percent": progress, "current_score": score, "next_rank_score": 2000}
-    elif score >= 500:
-        progress = int(((score - 500) / 500) * 100)
-        return {"current_title": "Scout", "image_path": "static/ranks/scout.svg", "next_title": "Veteran", "progress_percent": progress, "current_score": score, "next_rank_score": 1000}
-    else:
-        progress = int((score / 500) * 100)
-        return {"current_title": "Recruit", "image_path": "static/ranks/recruit.svg", "next_title": "Scout", "progress_percent": progress, "current_score": score, "next_rank_score": 500}
-
-def calculate_net_worth(stats):
-    ancient_debris = stats.get('mined_ancient_debris', 0)
-    diamond = stats.get('mined_diamond_ore', 0) + stats.get('mined_deepslate_diamond_ore', 0)
-    emerald = stats.get('mined_emerald_ore', 0) + stats.get('mined_deepslate_emerald_ore', 0)
-    gold = stats.get('mined_gold_ore', 0) + stats.get('mined_deepslate_gold_ore', 0)
-
-    return (ancient_debris * 5000) + (emerald * 2500) + (diamond * 1000) + (gold * 250)
+    """Display data for the player's tier; the thresholds are scanner.RANK_TIERS, like the stored rank_tier"""
+    i = next(i for i, (floor, _) in enumerate(RANK_TIERS) if score >= floor)
+    floor, title = RANK_TIERS[i]
+    rank = {"current_title": title, "image_path": f"static/ranks/{title.lower()}.svg", "current_score": score}
+    if i == 0:
+        return {**rank, "next_title": "Max Rank", "progress_percent": 100, "next_rank_score": None}
+    next_floor, next_title = RANK_TIERS[i - 1]
+    progress = int(((score - floor) / (next_floor - floor)) * 100)
+    return {**rank, "next_title": next_title, "progress_percent": progress, "next_rank_score": next_floor}
 
 @app.route('/health')
 def health_check():
     return "OK", 200
 
 @app.route('/')
+@cached_page
 def index():
     conn = get_db_connection()
     query_param = request.args.get('q', '')
     page_param = request.args.get('page', 1, type=int)
     per_page = 10
 
-    if query_param:
-        count_query = "SELECT COUNT(*) FROM players WHERE gamertag LIKE ?"
-        count_args = (f"%{query_param}%",)
-    else:
-        count_query = "SELECT COUNT(*) FROM players"
-        count_args = ()
-
-    total_players = conn.execute(count_query, count_args).fetchone()[0]
+    total_players = queries.count_players(conn, query_param)
     total_pages = math.ceil(total_players / per_page)
     if page_param < 1: page_param = 1
     if page_param > total_pages and total_pages > 0: page_param = total_pages
     offset = (page_param - 1) * per_page
 
-    sql = '''
-        SELECT p.gamertag, p.uuid, COALESCE(SUM(d.points), 0) as score
-        FROM players p
-        LEFT JOIN unlocks u ON p.uuid = u.player_uuid
-        LEFT JOIN definitions d ON u.achievement_id = d.id
-    '''
-    sql_args = []
-    if query_param:
-        sql += " WHERE p.gamertag LIKE ? "
-        sql_args.append(f"%{query_param}%")
-    
-    sql += " GROUP BY p.uuid ORDER BY score DESC LIMIT ? OFFSET ? "
-    sql_args.extend([per_page, offset])
-
-    players = conn.execute(sql, tuple(sql_args)).fetchall()
-    
+    players = queries.players_by_offset(conn, query_param, per_page, offset)
+    # Stats and achievements are fetched for the whole page at once (no per-player queries)
+    details = queries.player_details(conn, tuple(p['uuid'] for p in players))
+
     dashboard_data = []
     for p in players:
-        stats_rows = conn.execute("SELECT stat_name, value FROM player_stats WHERE player_uuid = ?", (p['uuid'],)).fetchall()
-        stats = {row['stat_name']: row['value'] for row in stats_rows}
-
-        deaths = stats.get('total_deaths', 0)
-        net_worth = calculate_net_worth(stats)
-        
-        unlocks = conn.execute('''
-            SELECT d.id, d.name, d.description, d.icon, u.unlocked_at, d.threshold, d.points
-            FROM unlocks u JOIN definitions d ON u.achievement_id = d.id
-            WHERE u.player_uuid = ? ORDER BY u.unlocked_at DESC
-        ''', (p['uuid'],)).fetchall()
-        unlocked_ids = {u['id'] for u in unlocks}
-        
-        params = [p['uuid']]
-        if unlocked_ids: params.extend(unlocked_ids)
-        else: params.append('')
-        
-        progress_rows = conn.execute(f'''
-            SELECT d.id, d.name, d.description, d.icon, pp.current_value, d.threshold, d.points
-            FROM definitions d
-            LEFT JOIN player_progress pp ON d.id = pp.achievement_id AND pp.player_uuid = ?
-            WHERE d.id NOT IN ({','.join(['?']*len(unlocked_ids)) if unlocked_ids else '?'})
-        ''', tuple(params)).fetchall()
-
-        all_achievements = []
-        for u in unlocks:
-            all_achievements.append({"name": u['name'], "description": u['description'], "icon": u['icon'], "unlocked_at": u['unlocked_at'], "is_unlocked": True, "progress": 100, "current": u['threshold'], "total": u['threshold'], "points": u['points']})
-        for pr in progress_rows:
-            current = pr['current_value'] if pr['current_value'] else 0
-            percent = min(100, int((current / pr['threshold']) * 100))
-            all_achievements.append({"name": pr['name'], "description": pr['description'], "icon": pr['icon'], "is_unlocked": False, "progress": percent, "current": current, "total": pr['threshold'], "points": pr['points']})
-
+        detail = details[p['uuid']]
         dashboard_data.append({
             "uuid": p['uuid'],  # <--- FIXED: Added UUID so the template can link to it
-            "name": p['gamertag'] if p['gamertag'] else p['uuid'][:8],
+            "name": p['name'],
             "score": p['score'],
             "rank": get_player_rank(p['score']),
-            "achievements": all_achievements,
-            "deaths": deaths,
-            "net_worth": net_worth
+            "achievements": detail['achievements'],
+            "deaths": detail['stats'].get('total_deaths', 0),
+            "net_worth": p['net_worth']
         })
-    
-    global_score_row = conn.execute("SELECT SUM(score) FROM (SELECT COALESCE(SUM(d.points), 0) as score FROM players p LEFT JOIN unlocks u ON p.uuid = u.player_uuid LEFT JOIN definitions d ON u.achievement_id = d.id GROUP BY p.uuid)").fetchone()
-    global_score = global_score_row[0] if global_score_row and global_score_row[0] else 0
 
-    conn.close()
+    global_score = queries.global_score(conn)
+
     return render_template('index.html', data=dashboard_data, server_era=get_server_era(global_score), server_status=get_server_status(), current_page=page_param, total_pages=total_pages, search_query=query_param)
 
 @app.route('/leaderboard')
+@cached_page
 def leaderboard():
     conn = get_db_connection()
-    def get_top(stat): return conn.execute("SELECT p.gamertag, s.value FROM player_stats s JOIN players p ON s.player_uuid = p.uuid WHERE s.stat_name = ? ORDER BY s.value DESC LIMIT 5", (stat,)).fetchall()
-    
-    bloodlust = [{'rank': i+1, 'name': r['gamertag'], 'score': f"{r['value']:,}"} for i, r in enumerate(get_top('total_kills'))]
-    darwin = [{'rank': i+1, 'name': r['gamertag'], 'score': f"{r['value']:,}"} for i, r in enumerate(get_top('total_deaths'))]
-    no_lifers = [{'rank': i+1, 'name': r['gamertag'], 'score': f"{round(r['value']/72000, 1)} hrs"} for i, r in enumerate(get_top('play_time_ticks'))]
-    runners = [{'rank': i+1, 'name': r['gamertag'], 'score': f"{round(r['value']/100000, 2)} km"} for i, r in enumerate(get_top('distance_walked'))]
-    conn.close()
-    return render_template('leaderboard.html', bloodlust=bloodlust, darwin=darwin, no_lifers=no_lifers, runners=runners)
+    # ?source= narrows the boards to one server (MINECRAFT_SOURCES); the default is every server combined
+    source = request.args.get('source') or None
+    if source is not None and source not in SOURCE_NAMES:
+        return "Server not found", 404
+    # One card per leaderboard stat in stats.yaml
+    boards = [{"label": stat['label'], "entries": [{'rank': r['rank'], 'name': r['name'], 'score': format_value(stat, r['value'])}
+                                                   for r in queries.top_players(conn, stat['name'], 5, source)]}
+              for stat in LEADERBOARDS]
+    return render_template('leaderboard.html', boards=boards, sources=SOURCE_NAMES if len(SOURCE_NAMES) > 1 else [], current_source=source)
 
 @app.route('/server')
+@cached_page
 def server_intel():
-    conn = get_db_connection()
-
-    # 1. Fetch Global Aggregates (Single Query where possible)
-    # Note: Summing over all stats might be heavy, so we select specific stats
-    agg_query = '''
-        SELECT stat_name, SUM(value) as total
-        FROM player_stats
-        WHERE stat_name IN ('total_deaths', 'play_time_ticks', 'distance_walked')
-        GROUP BY stat_name
-    '''
-    aggs = {row['stat_name']: row['total'] for row in conn.execute(agg_query).fetchall()}
-
-    total_deaths = aggs.get('total_deaths', 0)
-    total_playtime = aggs.get('play_time_ticks', 0)
-    total_distance = aggs.get('distance_walked', 0)
-
-    # 2. Calculate Economy (Net Worth)
-    # We need to fetch all mining stats for all players to compute this accurately
-    # This is an expensive operation but necessary given the structure
-    # Optimization: Filter only mining stats
-    mining_stats = conn.execute('''
-        SELECT player_uuid, stat_name, value
-        FROM player_stats
-        WHERE stat_name IN (
-            'mined_ancient_debris',
-            'mined_diamond_ore', 'mined_deepslate_diamond_ore',
-            'mined_emerald_ore', 'mined_deepslate_emerald_ore',
-            'mined_gold_ore', 'mined_deepslate_gold_ore'
-        )
-    ''').fetchall()
-
-    player_wealth = {}
-    for row in mining_stats:
-        uid = row['player_uuid']
-        if uid not in player_wealth: player_wealth[uid] = {}
-        player_wealth[uid][row['stat_name']] = row['value']
-
-    # Calculate Total GDP and Oligarchs
-    total_gdp = 0
-    rich_list = []
-
-    # Need to map UUIDs to Gamertags for the list
-    players_map = {row['uuid']: row['gamertag'] for row in conn.execute("SELECT uuid, gamertag FROM players").fetchall()}
-
-    for uid, stats in player_wealth.items():
-        nw = calculate_net_worth(stats)
-        total_gdp += nw
-        name = players_map.get(uid, uid[:8])
-        rich_list.append({"name": name, "net_worth": nw})
-
-    # Sort for Oligarchs
-    rich_list.sort(key=lambda x: x['net_worth'], reverse=True)
-    top_3 = rich_list[:3]
+    totals = queries.server_totals(get_db_connection())
+    total_playtime = totals['play_time_ticks']
 
     # Formatting
-    gdp_formatted = f"${total_gdp:,}"
-    dist_km = f"{round(total_distance / 100000, 2):,} km"
+    gdp_formatted = f"${totals['gdp']:,}"
+    dist_km = f"{round(totals['distance_walked'] / 100000, 2):,} km"
 
     days = total_playtime // (72000 * 24)
     hours = (total_playtime % (72000 * 24)) // 72000
     playtime_formatted = f"{days} Days, {hours} Hours"
 
-    conn.close()
-
     return render_template('server.html',
                            gdp=gdp_formatted,
                            distance=dist_km,
                            playtime=playtime_formatted,
-                           casualties=f"{total_deaths:,}",
-                           oligarchs=top_3)
+                           casualties=f"{totals['total_deaths']:,}",
+                           oligarchs=totals['oligarchs'])
 
 @app.route('/player/<uuid>')
+@cached_page
 def player_profile(uuid):
-    conn = get_db_connection()
-    player_row = conn.execute("SELECT p.gamertag, p.uuid, COALESCE(SUM(d.points), 0) as score FROM players p LEFT JOIN unlocks u ON p.uuid = u.player_uuid LEFT JOIN definitions d ON u.achievement_id = d.id WHERE p.uuid = ? GROUP BY p.uuid", (uuid,)).fetchone()
-    
-    if not player_row:
-        conn.close()
+    profile = queries.player_profile(get_db_connection(), uuid)
+
+    if profile is None:
         return "Player not found", 404
 
-    stats_rows = conn.execute("SELECT stat_name, value FROM player_stats WHERE player_uuid = ?", (uuid,)).fetchall()
-    stats = {row['stat_name']: row['value'] for row in stats_rows}
-    
+    stats = profile['stats']
     kills = stats.get('total_kills', 0)
     deaths = stats.get('total_deaths', 0)
     kd = round(kills / deaths, 2) if deaths > 0 else kills
-    
-    net_worth = calculate_net_worth(stats)
-
-    mining_log = [
-        {"name": "Ancient Debris", "count": stats.get('mined_ancient_debris', 0), "value": 5000},
-        {"name": "Diamond Ore", "count": stats.get('mined_diamond_ore', 0) + stats.get('mined_deepslate_diamond_ore', 0), "value": 1000},
-        {"name": "Emerald Ore", "count": stats.get('mined_emerald_ore', 0) + stats.get('mined_deepslate_emerald_ore', 0), "value": 2500},
-        {"name": "Gold Ore", "count": stats.get('mined_gold_ore', 0) + stats.get('mined_deepslate_gold_ore', 0), "value": 250}
-    ]
-
-    unlocks = conn.execute("SELECT d.id, d.name, d.description, d.icon, u.unlocked_at, d.threshold, d.points FROM unlocks u JOIN definitions d ON u.achievement_id = d.id WHERE u.player_uuid = ? ORDER BY u.unlocked_at DESC", (uuid,)).fetchall()
-    unlocked_ids = {u['id'] for u in unlocks}
-    
-    params = [uuid]
-    if unlocked_ids: params.extend(list(unlocked_ids))
-    else: params.append('')
-    
-    progress_rows = conn.execute(f"SELECT d.id, d.name, d.description, d.icon, pp.current_value, d.threshold, d.points FROM definitions d LEFT JOIN player_progress pp ON d.id = pp.achievement_id AND pp.player_uuid = ? WHERE d.id NOT IN ({','.join(['?']*len(unlocked_ids)) if unlocked_ids else '?'})", tuple(params)).fetchall()
-    
-    all_achievements = []
-    for u in unlocks: all_achievements.append({"name": u['name'], "description": u['description'], "icon": u['icon'], "unlocked_at": u['unlocked_at'], "is_unlocked": True, "progress": 100, "current": u['threshold'], "total": u['threshold'], "points": u['points']})
-    for pr in progress_rows:
-        current = pr['current_value'] if pr['current_value'] else 0
-        percent = min(100, int((current / pr['threshold']) * 100))
-        all_achievements.append({"name": pr['name'], "description": pr['description'], "icon": pr['icon'], "is_unlocked": False, "progress": percent, "current": current, "total": pr['threshold'], "points": pr['points']})
-
-    score = player_row['score']
-    conn.close()
-    
+
+    week_ticks = profile['week']['play_time_ticks']
+    week = {
+        "kills": profile['week']['total_kills'],
+        "deaths": profile['week']['total_deaths'],
+        "playtime": f"{week_ticks // 72000}h {(week_ticks % 72000) // 1200}m",
+        "distance": f"{round(profile['week']['distance_walked'] / 100000, 2)} km"
+    }
+
+    standings = [{"label": stat['label'], **profile['ranks'][stat['name']]} for stat in LEADERBOARDS if stat['name'] in profile['ranks']]
+
+    score = profile['score']
+
     return render_template('profile.html', player={
-        "uuid": player_row['uuid'], "gamertag": player_row['gamertag'], "score": score,
+        "uuid": profile['uuid'], "gamertag": profile['gamertag'], "score": score,
         "rank": get_player_rank(score), "era_class": get_player_era(score),
         "stats": {"kills": kills, "deaths": deaths, "kd": kd, "playtime": f"{stats.get('play_time_ticks',0)//72000}h {(stats.get('play_time_ticks',0)%3600)//60}m"},
-        "achievements": all_achievements,
-        "net_worth": net_worth,
-        "mining_log": mining_log
+        "achievements": profile['achievements'],
+        "net_worth": profile['net_worth'],
+        "mining_log": mining_log(stats),
+        "standings": standings,
+        "week": week
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target; sums the snapshots of every web worker and the scanner"""
+    metrics.flush(force=True)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/events')
+def event_stream():
+    """Live feed (unlocks, stat changes, server status) as Server-Sent Events.
+
+    Each response replays what happened since Last-Event-ID and ends; the
+    `retry:` hint brings the browser back shortly after. Nothing waits on new
+    events, so a client never ties up a gunicorn worker thread between updates.
+    """
+    conn = get_db_connection()
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('since', type=int)
+    latest = events.latest_id(conn)
+    if last_id is None or last_id > latest:
+        # New subscribers start from now rather than replaying the whole outbox;
+        # an id from the future means the database was recreated
+        last_id = latest
+
+    rows = events.read_since(conn, last_id)
+    response = Response(events.format_stream(rows, last_id), mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    return response
+
+# Trend queries accept any harvested stat, bucketed by hour or day
+TREND_STATS = {name for name, _, _ in HARVEST}
+TREND_BUCKETS = {"hour": HOUR, "day": DAY}
+
+def parse_trend_args():
+    stat = request.args.get('stat', 'play_time_ticks')
+    bucket = TREND_BUCKETS.get(request.args.get('bucket', 'day'))
+    days = min(max(request.args.get('days', 7, type=int), 1), HISTORY_DAILY_DAYS)
+    if stat not in TREND_STATS or bucket is None:
+        return None
+    return stat, days, bucket
+
+def trend_response(stat, days, bucket, points):
+    return jsonify({"stat": stat, "days": days, "bucket": bucket, "points": [{"t": t, "delta": d} for t, d in points]})
+
+@app.route('/api/v1/trends/server')
+def server_trend():
+    args = parse_trend_args()
+    if args is None:
+        return jsonify({"error": f"stat must be one of {sorted(TREND_STATS)}, bucket one of {sorted(TREND_BUCKETS)}"}), 400
+    return trend_response(*args, query_trend(get_db_connection(), args[0], None, args[1], args[2]))
+
+@app.route('/api/v1/players/<uuid>/trends')
+def player_trend(uuid):
+    args = parse_trend_args()
+    if args is None:
+        return jsonify({"error": f"stat must be one of {sorted(TREND_STATS)}, bucket one of {sorted(TREND_BUCKETS)}"}), 400
+    return trend_response(*args, query_trend(get_db_connection(), args[0], uuid, args[1], args[2]))
+
+# --- JSON API ---
+# Same cached queries as the pages, without the formatting. The player list is
+# paged with an opaque (score, uuid) cursor, so deep pages cost the same as the first.
+# Every endpoint accepts ?fields=a,b,c to trim the response.
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+LEADERBOARD_STATS = tuple(stat['name'] for stat in LEADERBOARDS)
+DETAIL_FIELDS = {'stats', 'achievements'}  # Only included in /players when asked for
+
+def encode_cursor(player):
+    return base64.urlsafe_b64encode(f"{player['score']}:{player['uuid']}".encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for anything it didn't produce"""
+    score, uuid = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().split(":", 1)
+    return int(score), uuid
+
+def requested_fields():
+    """?fields= as a set, or None when absent"""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return {f.strip() for f in fields.split(',') if f.strip()}
+
+def select_fields(item, fields):
+    return item if fields is None else {k: v for k, v in item.items() if k in fields}
+
+def api_limit(default):
+    return min(max(request.args.get('limit', default, type=int), 1), API_MAX_PAGE_SIZE)
+
+@app.route('/api/v1/players')
+@cached_page
+def api_players():
+    conn = get_db_connection()
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+    limit = api_limit(API_PAGE_SIZE)
+    fields = requested_fields()
+
+    players = queries.players_after(conn, request.args.get('q', ''), limit, cursor or None)
+    next_cursor = encode_cursor(players[-1]) if len(players) == limit else None
+    if fields and fields & DETAIL_FIELDS:
+        details = queries.player_details(conn, tuple(p['uuid'] for p in players))
+        players = [{**p, **details[p['uuid']]} for p in players]
+
+    return jsonify({"players": [select_fields(p, fields) for p in players], "next_cursor": next_cursor})
+
+@app.route('/api/v1/players/search')
+def api_player_search():
+    # Called on every keystroke; served straight from the indexes rather than cached
+    text = request.args.get('q', '').strip()
+    players = queries.autocomplete(get_db_connection(), text, min(max(request.args.get('limit', 8, type=int), 1), 25)) if text else []
+    return jsonify({"players": players})
+
+@app.route('/api/v1/players/<uuid>')
+@cached_page
+def api_player(uuid):
+    profile = queries.player_profile(get_db_connection(), uuid)
+    if profile is None:
+        return jsonify({"error": "player not found"}), 404
+    player = {**profile, "name": profile['gamertag'] or uuid[:8], "rank_tier": rank_tier(profile['score'])}
+    return jsonify(select_fields(player, requested_fields()))
+
+@app.route('/api/v1/leaderboard')
+@cached_page
+def api_leaderboard():
+    conn = get_db_connection()
+    limit = api_limit(5)
+    fields = requested_fields()
+    source = request.args.get('source') or None
+    if source is not None and source not in SOURCE_NAMES:
+        return jsonify({"error": f"source must be one of {SOURCE_NAMES}"}), 400
+    return jsonify({stat: queries.top_players(conn, stat, limit, source) for stat in LEADERBOARD_STATS if fields is None or stat in fields})
+
+@app.route('/api/v1/server')
+@cached_page
+def api_server():
+    conn = get_db_connection()
+    total_score = queries.global_score(conn)
+    server = {**queries.server_totals(conn), "total_score": total_score, "era": get_server_era(total_score)['class_name'], "status": get_server_status()}
+    return jsonify(select_fields(server, requested_fields()))
+
 if __name__ == '__main__':
     if not os.path.exists(DB_NAME): init_system()
     else: init_system()
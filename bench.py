@@ -0,0 +1,284 @@
+# Core-X // Benchmark Harness
+# Generates a synthetic server (stats/*.json + usercache.json), times cold, warm
+# and incremental scan passes, load-tests the main routes through the Flask test
+# client and writes a JSON report. With --baseline it exits non-zero when scan
+# time, p95 latency or throughput regressed by more than --tolerance.
+#
+#   python bench.py --players 5000 --out bench.json
+#   python bench.py --players 5000 --baseline bench.json
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+
+# Vocabulary for the generated files. Real stats files carry a few hundred keys,
+# most of them rarely-used blocks and items; the tail is padded with generic names.
+BLOCKS = ["stone", "dirt", "grass_block", "deepslate", "cobblestone", "andesite", "diorite", "granite", "gravel", "sand",
+          "netherrack", "oak_log", "birch_log", "spruce_log", "oak_leaves", "coal_ore", "iron_ore", "copper_ore",
+          "deepslate_iron_ore", "redstone_ore", "lapis_ore", "obsidian", "tuff", "basalt", "blackstone", "clay"]
+# Share of all blocks mined that are this ore
+ORES = {"diamond_ore": 0.0008, "deepslate_diamond_ore": 0.0015, "emerald_ore": 0.0002, "deepslate_emerald_ore": 0.0001,
+        "gold_ore": 0.002, "deepslate_gold_ore": 0.0015, "ancient_debris": 0.0002}
+MOBS = ["zombie", "skeleton", "creeper", "spider", "enderman", "witch", "slime", "drowned", "husk", "piglin", "blaze", "phantom"]
+ITEMS = ["crafting_table", "stone_pickaxe", "iron_pickaxe", "diamond_pickaxe", "bread", "torch", "furnace", "chest",
+         "oak_planks", "stick", "iron_ingot", "bucket", "shield", "bow", "arrow", "bed"]
+TAIL_KEYS = 250
+CUSTOM = ["jump", "sneak_time", "sprint_one_cm", "swim_one_cm", "fly_one_cm", "boat_one_cm", "horse_one_cm", "fall_one_cm",
+          "damage_dealt", "damage_taken", "enchant_item", "open_chest", "sleep_in_bed", "interact_with_furnace",
+          "leave_game", "time_since_death", "time_since_rest", "total_world_time", "player_kills", "drop"]
+SYLLABLES = ["ka", "zu", "mi", "tor", "rex", "ly", "vo", "an", "gri", "sh", "el", "dra", "bo", "nix", "qu", "fe"]
+
+def player_name(rng, i):
+    name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    return f"{name}_{i}" if rng.random() < 0.4 else f"{name}{i}"
+
+def player_stats(rng):
+    """One stats file. Play time is log-normal (most players casual, a few living on the
+    server) and everything else scales with it, with per-player noise."""
+    hours = min(rng.lognormvariate(2.0, 1.5), 3000)
+    noise = lambda: rng.lognormvariate(0, 0.4)
+
+    mined_total = hours * 400 * noise()
+    weights = [rng.expovariate(1) for _ in BLOCKS]
+    mined = {f"minecraft:{b}": int(mined_total * w / sum(weights)) for b, w in zip(BLOCKS, weights)}
+    mined.update({f"minecraft:{ore}": int(mined_total * share * noise()) for ore, share in ORES.items()})
+    breadth = min(TAIL_KEYS, int(10 + hours * 2))
+    mined.update({f"minecraft:block_{k}": rng.randint(1, 64) for k in rng.sample(range(TAIL_KEYS), breadth)})
+
+    kills = int(hours * 8 * noise())
+    weights = [rng.expovariate(1) for _ in MOBS]
+    killed = {f"minecraft:{m}": int(kills * w / sum(weights)) for m, w in zip(MOBS, weights)}
+    if hours > 200 and rng.random() < 0.3:
+        killed["minecraft:ender_dragon"] = rng.randint(1, 3)
+
+    custom = {f"minecraft:{c}": int(hours * rng.randint(10, 5000)) for c in CUSTOM}
+    custom.update({
+        "minecraft:play_time": int(hours * 72000),
+        "minecraft:walk_one_cm": int(hours * 300000 * noise()),
+        "minecraft:mob_kills": kills,
+        "minecraft:deaths": int(hours * 0.5 * noise()),
+    })
+
+    items = {f"minecraft:{i}": int(hours * noise()) + 1 for i in ITEMS}
+    items.update({f"minecraft:item_{k}": rng.randint(1, 200) for k in rng.sample(range(TAIL_KEYS), breadth)})
+    return {"stats": {
+        "minecraft:custom": custom, "minecraft:mined": mined, "minecraft:killed": killed,
+        "minecraft:crafted": {k: v for k, v in items.items() if rng.random() < 0.5},
+        "minecraft:used": {k: v * 3 for k, v in items.items() if rng.random() < 0.7},
+        "minecraft:picked_up": {k: v * 5 for k, v in items.items() if rng.random() < 0.6},
+    }, "DataVersion": 3465}
+
+def generate(root, players, seed):
+    """Writes root/stats/<uuid>.json and root/usercache.json; returns the uuids"""
+    rng = random.Random(seed)
+    stats_dir = os.path.join(root, "stats")
+    os.makedirs(stats_dir, exist_ok=True)
+    cache, uuids = [], []
+    for i in range(players):
+        uuid = "%08x-%04x-%04x-%04x-%012x" % tuple(rng.getrandbits(b) for b in (32, 16, 16, 16, 48))
+        uuids.append(uuid)
+        cache.append({"name": player_name(rng, i), "uuid": uuid, "expiresOn": "2099-01-01 00:00:00 +0000"})
+        with open(os.path.join(stats_dir, f"{uuid}.json"), "w") as f:
+            json.dump(player_stats(rng), f)
+    with open(os.path.join(root, "usercache.json"), "w") as f:
+        json.dump(cache, f)
+    return uuids
+
+def churn(root, uuids, fraction, rng):
+    """Simulates a play session: a share of the players gain play time, kills and blocks"""
+    for uuid in rng.sample(uuids, max(1, int(len(uuids) * fraction))):
+        path = os.path.join(root, "stats", f"{uuid}.json")
+        with open(path) as f:
+            data = json.load(f)
+        custom = data["stats"]["minecraft:custom"]
+        custom["minecraft:play_time"] += rng.randint(1200, 72000)
+        custom["minecraft:mob_kills"] += rng.randint(0, 20)
+        custom["minecraft:walk_one_cm"] += rng.randint(1000, 300000)
+        data["stats"]["minecraft:mined"]["minecraft:stone"] += rng.randint(0, 500)
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+def summarize(samples):
+    """Latency summary in milliseconds (nearest-rank percentiles)"""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000
+    total = sum(ordered)
+    return {"requests": len(ordered), "mean_ms": total / len(ordered) * 1000, "p50_ms": pick(0.5), "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000, "rps": len(ordered) / total if total else None}
+
+def timed_scan(scanner, metrics):
+    """Runs one pass; returns its duration, file counters and per-phase seconds"""
+    before = metrics.histogram_sums("corex_scan_phase_seconds")
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        start = time.perf_counter()
+        counts = scanner.scan_sector()
+        elapsed = time.perf_counter() - start
+    after = metrics.histogram_sums("corex_scan_phase_seconds")
+    phases = {dict(labels)["phase"]: total - before.get(labels, 0.0) for labels, total in after.items()}
+    return {"seconds": elapsed, "files_per_second": counts["processed"] / elapsed if elapsed else None, **counts,
+            "phases": {k: v for k, v in sorted(phases.items()) if v}}
+
+def load_test(client, paths, requests, reset=None, warm=False):
+    if warm:
+        for path in paths:
+            client.get(path)
+    samples = []
+    for i in range(requests):
+        path = paths[i % len(paths)]
+        if reset:
+            reset()
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+    return summarize(samples)
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="corex-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # The modules read their configuration at import time, so point them at the sandbox first
+    os.environ.update({
+        "MINECRAFT_STATS": os.path.join(workdir, "stats"),
+        "MINECRAFT_CACHE": os.path.join(workdir, "usercache.json"),
+        "DB_PATH": os.path.join(workdir, "corex.db"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+    })
+    os.environ.pop("MINECRAFT_SOURCES", None) # One synthetic server
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) # init_db reads achievements.yaml from here
+    sys.path.insert(0, os.getcwd())
+
+    import init_db, scanner, metrics, queries
+    import app as web
+
+    rng = random.Random(args.seed)
+    try:
+        start = time.perf_counter()
+        uuids = generate(workdir, args.players, args.seed)
+        generated = time.perf_counter() - start
+        stats_bytes = sum(e.stat().st_size for e in os.scandir(os.environ["MINECRAFT_STATS"]))
+
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            init_db.init_system()
+        scans = {"cold": timed_scan(scanner, metrics), "warm": timed_scan(scanner, metrics)}
+        churn(workdir, uuids, args.churn, rng)
+        scans["incremental"] = timed_scan(scanner, metrics)
+
+        with sqlite3.connect(os.environ["DB_PATH"]) as conn:
+            names = [row[0] for row in conn.execute("SELECT gamertag FROM players")]
+        deep_page = max(1, math.ceil(len(uuids) / 10) // 2)
+        targets = {
+            "/": ["/"],
+            "/?page=": [f"/?page={deep_page}"],
+            "/?q=": [f"/?q={rng.choice(names)[1:4]}" for _ in range(20)],
+            "/leaderboard": ["/leaderboard"],
+            "/server": ["/server"],
+            "/player/<uuid>": [f"/player/{u}" for u in rng.sample(uuids, min(50, len(uuids)))],
+            "/api/v1/players": ["/api/v1/players"],
+        }
+
+        def clear_caches():
+            web.page_cache.clear()
+            queries.query_cache.clear()
+
+        client = web.app.test_client()
+        routes = {}
+        for label, paths in targets.items():
+            routes[label] = {
+                # Every request rebuilt from SQLite, as right after a scan commits
+                "uncached": load_test(client, paths, args.requests, reset=clear_caches),
+                # Served from the per-generation page cache
+                "cached": load_test(client, paths, args.requests, warm=True),
+            }
+
+        return {
+            "meta": {
+                "players": args.players, "seed": args.seed, "requests": args.requests, "churn": args.churn,
+                "stats_bytes": stats_bytes, "generate_seconds": generated,
+                "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "cpus": os.cpu_count(),
+                "scan_workers": scanner.SCAN_WORKERS, "scan_parser": scanner.SCAN_PARSER,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            },
+            "scan": scans,
+            "routes": routes,
+        }
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Lists the measurements that got worse than `baseline` by more than `tolerance`.
+
+    Latency changes under `min_delta_ms` are ignored; sub-millisecond timings are mostly noise.
+    """
+    regressions = []
+    for name, scan in report["scan"].items():
+        old = baseline.get("scan", {}).get(name)
+        if old and scan["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(f"scan {name}: {old['seconds']:.3f}s -> {scan['seconds']:.3f}s")
+    for route, modes in report["routes"].items():
+        for mode, result in modes.items():
+            old = baseline.get("routes", {}).get(route, {}).get(mode)
+            if not old:
+                continue
+            if result["p95_ms"] > old["p95_ms"] * (1 + tolerance) and result["p95_ms"] - old["p95_ms"] >= min_delta_ms:
+                regressions.append(f"{route} ({mode}) p95: {old['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+            if old["rps"] and result["rps"] < old["rps"] * (1 - tolerance) and 1000 / result["rps"] - 1000 / old["rps"] >= min_delta_ms:
+                regressions.append(f"{route} ({mode}) throughput: {old['rps']:.0f} -> {result['rps']:.0f} req/s")
+    return regressions
+
+def print_summary(report):
+    out = sys.stderr
+    meta = report["meta"]
+    print(f"⏱️  {meta['players']} players, {meta['stats_bytes'] / 1e6:.1f} MB of stats", file=out)
+    for name, scan in report["scan"].items():
+        phases = ", ".join(f"{k} {v:.2f}s" for k, v in scan["phases"].items())
+        print(f"   scan {name:<12} {scan['seconds']:8.3f}s  {scan['processed']:>7} processed  ({phases})", file=out)
+    for route, modes in report["routes"].items():
+        for mode, r in modes.items():
+            print(f"   {route:<16} {mode:<9} p50 {r['p50_ms']:7.2f}ms  p95 {r['p95_ms']:7.2f}ms  {r['rps']:8.0f} req/s", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Core-X scanner and web routes on synthetic data")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=100, help="requests per route and cache mode")
+    parser.add_argument("--churn", type=float, default=0.05, help="share of players changed before the incremental scan")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="where to generate data (default: a temp dir, removed afterwards)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated temp dir")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_summary(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"❌ Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# Core-X // Database Module
+# Shared SQLite connection setup for the web server, scanner and initializer.
+
+import os
+import sqlite3
+from pathlib import Path
+
+# CONFIGURATION
+DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", 5000))            # ms to wait on a locked DB
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 64 * 1024 * 1024))      # bytes of the DB file to memory-map
+
+def configure(conn, readonly=False):
+    """Per-connection pragmas. WAL lets the web workers read while the scanner writes."""
+    if not readonly:
+        conn.execute("PRAGMA journal_mode = WAL")
+        # NORMAL is durable across application crashes in WAL mode, and skips an fsync per commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    return conn
+
+def connect(path, readonly=False, **kwargs):
+    if readonly:
+        # URI form so SQLite itself refuses writes; the web tier never needs them
+        path = f"{Path(path).resolve().as_uri()}?mode=ro"
+        kwargs["uri"] = True
+    return configure(sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT / 1000, **kwargs), readonly)
@@ -5,6 +5,9 @@ set -e
 echo "🛠️  Initializing Database..."
 python init_db.py
 
+# Metric snapshots from a previous run would be added to this one's
+rm -rf "${METRICS_DIR:-/tmp/corex-metrics}"
+
 # Start Scanner in Background
 echo "📡 Starting Background Scanner..."
 python scanner.py &
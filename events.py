@@ -0,0 +1,46 @@
+# Core-X // Events Module
+# Outbox of live-feed events. The scanner appends rows in the same transaction
+# as the data they describe; the web tier replays them to browsers over SSE.
+
+import os
+import json
+import time
+
+# CONFIGURATION
+EVENTS_RETENTION = int(os.getenv("EVENTS_RETENTION", 3600))    # Seconds events stay replayable
+EVENTS_RETRY = int(os.getenv("EVENTS_RETRY", 5000))            # ms browsers wait before asking for more
+EVENTS_BATCH = 200                                             # Most events sent per response
+
+UNLOCK = "unlock"
+STATS = "stats"
+STATUS = "status"
+
+def publish(cursor, events, now=None):
+    """Appends [(type, player_uuid, payload_dict), ...] to the outbox"""
+    now = now or time.time()
+    cursor.executemany("INSERT INTO events (created_at, type, player_uuid, payload) VALUES (?, ?, ?, ?)",
+                       [(now, kind, uuid, json.dumps(payload, separators=(',', ':'))) for kind, uuid, payload in events])
+
+def prune(cursor, now=None):
+    """Drops events older than EVENTS_RETENTION"""
+    cursor.execute("DELETE FROM events WHERE created_at < ?", ((now or time.time()) - EVENTS_RETENTION,))
+
+def latest_id(conn):
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+def read_since(conn, last_id, limit=EVENTS_BATCH):
+    """[(id, type, payload_json), ...] newer than `last_id`, oldest first"""
+    return [tuple(row) for row in conn.execute("SELECT id, type, payload FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit))]
+
+def format_stream(rows, last_id):
+    """Renders rows as a text/event-stream body.
+
+    The body always ends with the newest id, so a reconnecting EventSource
+    resumes from there even when there was nothing to send.
+    """
+    out = [f"retry: {EVENTS_RETRY}\n\n"]
+    for event_id, kind, payload in rows:
+        out.append(f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n")
+    if not rows:
+        out.append(f"id: {last_id}\n\n")
+    return "".join(out)
@@ -0,0 +1,149 @@
+# Core-X // Export Module
+# Static snapshot of the dashboard. When EXPORT_DIR is set, a thread in the
+# scanner process renders the pages and their JSON after every pass, so a plain
+# static file server can serve the hot paths without opening the database.
+# Only what changed is rendered again: the shared pages when the scan generation
+# or server status moved, a profile when the scanner stamped that player. Rank
+# moves alone don't stamp anyone (one climber shifts everyone below), so every
+# profile is also swept once per EXPORT_REFRESH.
+
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import db
+import queries
+import metrics
+from server_status import read_status, STATUS_INTERVAL
+
+# CONFIGURATION
+EXPORT_DIR = os.getenv("EXPORT_DIR")                              # Unset = no export
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", 200))                # Most profiles rendered per round
+EXPORT_REFRESH = int(os.getenv("EXPORT_REFRESH", 86400))          # Seconds between sweeps of every profile; 0 = never
+EXPORT_PAUSE = 0.5                                                # Seconds between rounds while catching up
+DB_NAME = os.getenv("DB_PATH", "corex.db")
+
+# Pages and API responses that show the whole server
+SHARED_ROUTES = ["/", "/leaderboard", "/server", "/api/v1/players", "/api/v1/leaderboard", "/api/v1/server"]
+
+_wake = threading.Event()
+
+def player_routes(uuid):
+    return [f"/player/{uuid}", f"/api/v1/players/{uuid}"]
+
+def output_path(route):
+    """Where a route is written under EXPORT_DIR: pages as <route>/index.html, API responses as <route>.json"""
+    if route.startswith("/api/"):
+        return route.lstrip("/") + ".json"
+    return os.path.join(route.strip("/"), "index.html")
+
+def write_file(path, body):
+    """Writes body to EXPORT_DIR/path through a temp file and a rename, so a reader never sees half a file"""
+    target = os.path.join(EXPORT_DIR, path)
+    folder = os.path.dirname(target)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".export-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+        os.chmod(tmp, 0o644) # mkstemp creates 0600; the static server may run as another user
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def definitions_fingerprint(conn):
+    """Every profile lists the achievements, so editing them sweeps all players"""
+    rows = conn.execute("SELECT * FROM definitions ORDER BY id").fetchall()
+    return hashlib.md5(repr(rows).encode()).hexdigest()
+
+def plan(conn, now=None):
+    """(routes to render, export_state row to store once they are written, whether a sweep starts)"""
+    now = now or time.time()
+    state = dict(zip(("export_dir", "generation", "status", "definitions", "cursor_generation", "cursor_uuid", "refreshed_at"),
+                     conn.execute("SELECT export_dir, generation, status, definitions, cursor_generation, cursor_uuid, refreshed_at FROM export_state WHERE id = 1").fetchone()))
+    generation, _ = queries.get_scan_generation(conn)
+    status = read_status(conn)
+    definitions = definitions_fingerprint(conn)
+
+    # A new or emptied directory, edited achievements, or a due refresh: walk every profile again
+    sweep = (state["export_dir"] != EXPORT_DIR or definitions != state["definitions"]
+             or not os.path.exists(os.path.join(EXPORT_DIR, "index.html"))
+             or (EXPORT_REFRESH and now - state["refreshed_at"] >= EXPORT_REFRESH))
+    if sweep:
+        state.update(export_dir=EXPORT_DIR, definitions=definitions, cursor_generation=-1, cursor_uuid="", refreshed_at=now)
+
+    routes = []
+    if sweep or (generation, status) != (state["generation"], state["status"]):
+        routes += SHARED_ROUTES
+        state.update(generation=generation, status=status)
+    # Keyset walk over idx_players_changed, resuming after the last profile written
+    rows = conn.execute('''
+        SELECT uuid, changed_generation FROM players
+        WHERE changed_generation >= ? AND (changed_generation > ? OR uuid > ?)
+        ORDER BY changed_generation, uuid LIMIT ?
+    ''', (state["cursor_generation"], state["cursor_generation"], state["cursor_uuid"], EXPORT_BATCH)).fetchall()
+    for uuid, _ in rows:
+        routes += player_routes(uuid)
+    if rows:
+        state.update(cursor_uuid=rows[-1][0], cursor_generation=rows[-1][1])
+    return routes, state, sweep, len(rows) == EXPORT_BATCH
+
+def export_round():
+    """Renders the next batch of changes into EXPORT_DIR. Returns True if more profiles are waiting.
+
+    Errors are reported and leave export_state alone, so the next round retries the same batch.
+    """
+    from app import app # The web app imports the scanner, so it is only loaded by the exporter thread
+    conn = db.connect(DB_NAME)
+    try:
+        routes, state, sweep, more = plan(conn)
+        if sweep:
+            shutil.copytree(app.static_folder, os.path.join(EXPORT_DIR, "static"), dirs_exist_ok=True)
+        client = app.test_client()
+        written = 0
+        for route in routes:
+            # Marked so the app doesn't count these renders as web traffic
+            response = client.get(route, environ_base={"corex.export": True})
+            if response.status_code != 200:
+                print(f"⚠️  Export: {route} returned {response.status_code}, skipped")
+                continue
+            write_file(output_path(route), response.get_data())
+            written += 1
+
+        conn.execute('''
+            UPDATE export_state SET export_dir = ?, generation = ?, status = ?, definitions = ?,
+                cursor_generation = ?, cursor_uuid = ?, refreshed_at = ?
+            WHERE id = 1
+        ''', (state["export_dir"], state["generation"], state["status"], state["definitions"],
+              state["cursor_generation"], state["cursor_uuid"], state["refreshed_at"]))
+        conn.commit()
+    except Exception as e:
+        print(f"❌ Export Error: {e}")
+        metrics.inc("corex_scan_errors_total", stage="export")
+        return False
+    finally:
+        conn.close()
+
+    metrics.inc("corex_export_files_total", written)
+    if written:
+        print(f"🗂️  Exported {written} files to {EXPORT_DIR}")
+    return more
+
+def notify():
+    """Called by the scanner after each pass; wakes the exporter thread if there is one"""
+    _wake.set()
+
+def export_loop():
+    while True:
+        _wake.wait(STATUS_INTERVAL) # The dashboard shows the server status too
+        _wake.clear()
+        # Big backlogs (first export, a sweep) go out in batches, leaving the scanner room in between
+        while export_round():
+            time.sleep(EXPORT_PAUSE)
+
+def start_exporter():
+    threading.Thread(target=export_loop, name="exporter", daemon=True).start()
+    print(f"🗂️  Exporting static pages to {EXPORT_DIR}")
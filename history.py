@@ -0,0 +1,124 @@
+# Core-X // History Module
+# Time-series of stat changes. The scanner appends one delta row per changed
+# value; old rows are periodically rolled up into hourly and daily buckets.
+
+import os
+import time
+
+# CONFIGURATION
+HISTORY_RAW_DAYS = int(os.getenv("HISTORY_RAW_DAYS", 2))          # Keep individual deltas this long
+HISTORY_HOURLY_DAYS = int(os.getenv("HISTORY_HOURLY_DAYS", 30))   # Then hourly buckets this long
+HISTORY_DAILY_DAYS = int(os.getenv("HISTORY_DAILY_DAYS", 400))    # Then daily buckets, then pruned
+HISTORY_ROLLUP_INTERVAL = 3600                                    # Seconds between compaction runs
+
+HOUR = 3600
+DAY = 86400
+SERVER = ''  # player_uuid used for server-wide rollups
+
+def stat_delta(old, new):
+    """Amount a counter grew by. A drop means the stats file was reset, so count from zero."""
+    return new - old if new >= old else new
+
+def record_changes(cursor, changes, now=None):
+    """Appends [(player_uuid, stat_name, old_value, new_value), ...] to the history.
+
+    Players seen for the first time (old_value None) only set a baseline; their
+    lifetime totals would otherwise land in "this week".
+    """
+    now = int(now or time.time())
+    hour = now - now % HOUR
+    rows, server = [], {}
+    for uuid, stat, old, new in changes:
+        if old is None:
+            continue
+        delta = stat_delta(old, new)
+        if delta:
+            rows.append((uuid, stat, now, delta))
+            server[stat] = server.get(stat, 0) + delta
+
+    cursor.executemany("INSERT INTO stat_history (player_uuid, stat_name, ts, delta) VALUES (?, ?, ?, ?)", rows)
+    # Server-wide trends are kept pre-aggregated so they never scan per-player rows
+    cursor.executemany('''
+        INSERT INTO stat_rollups (player_uuid, stat_name, bucket, resolution, delta)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(player_uuid, stat_name, bucket, resolution) DO UPDATE SET delta = delta + excluded.delta
+    ''', [(SERVER, stat, hour, HOUR, delta) for stat, delta in server.items()])
+
+def _roll_up(cursor, select_sql, args):
+    cursor.execute(f'''
+        INSERT INTO stat_rollups (player_uuid, stat_name, bucket, resolution, delta)
+        {select_sql}
+        ON CONFLICT(player_uuid, stat_name, bucket, resolution) DO UPDATE SET delta = delta + excluded.delta
+    ''', args)
+
+def compact(cursor, now=None):
+    """Moves raw deltas into hourly buckets, hourly into daily, and drops expired days"""
+    now = int(now or time.time())
+
+    # 1. Raw -> hourly (cutoff on an hour boundary so no bucket is split)
+    cutoff = now - HISTORY_RAW_DAYS * DAY
+    cutoff -= cutoff % HOUR
+    _roll_up(cursor, f'''
+        SELECT player_uuid, stat_name, ts - ts % {HOUR}, {HOUR}, SUM(delta)
+        FROM stat_history WHERE ts < ? GROUP BY 1, 2, 3
+    ''', (cutoff,))
+    cursor.execute("DELETE FROM stat_history WHERE ts < ?", (cutoff,))
+
+    # 2. Hourly -> daily
+    cutoff = now - HISTORY_HOURLY_DAYS * DAY
+    cutoff -= cutoff % DAY
+    _roll_up(cursor, f'''
+        SELECT player_uuid, stat_name, bucket - bucket % {DAY}, {DAY}, SUM(delta)
+        FROM stat_rollups WHERE resolution = {HOUR} AND bucket < ? GROUP BY 1, 2, 3
+    ''', (cutoff,))
+    cursor.execute(f"DELETE FROM stat_rollups WHERE resolution = {HOUR} AND bucket < ?", (cutoff,))
+
+    # 3. Retention
+    cursor.execute(f"DELETE FROM stat_rollups WHERE resolution = {DAY} AND bucket < ?", (now - HISTORY_DAILY_DAYS * DAY,))
+
+_last_compaction = {"at": 0}
+
+def maybe_compact(cursor):
+    """Runs compact() at most once per HISTORY_ROLLUP_INTERVAL"""
+    if time.time() - _last_compaction["at"] < HISTORY_ROLLUP_INTERVAL:
+        return False
+    compact(cursor)
+    _last_compaction["at"] = time.time()
+    return True
+
+def query_trend(conn, stat, uuid=None, days=7, bucket=DAY):
+    """Returns [(bucket_start, delta), ...] for one player, or the whole server when uuid is None.
+
+    Rows coarser than `bucket` (old daily rollups) land in the bucket they start in.
+    """
+    since = int(time.time()) - days * DAY
+    if uuid is None:
+        sql = '''
+            SELECT bucket - bucket % :b AS b, SUM(delta) FROM stat_rollups
+            WHERE player_uuid = :uuid AND stat_name = :stat AND bucket >= :since
+            GROUP BY b ORDER BY b
+        '''
+        uuid = SERVER
+    else:
+        sql = '''
+            SELECT t - t % :b AS b, SUM(delta) FROM (
+                SELECT ts AS t, delta FROM stat_history
+                WHERE player_uuid = :uuid AND stat_name = :stat AND ts >= :since
+                UNION ALL
+                SELECT bucket AS t, delta FROM stat_rollups
+                WHERE player_uuid = :uuid AND stat_name = :stat AND bucket >= :since
+            ) GROUP BY b ORDER BY b
+        '''
+    return [tuple(row) for row in conn.execute(sql, {"b": bucket, "uuid": uuid, "stat": stat, "since": since - since % bucket})]
+
+def period_total(conn, stat, uuid, days):
+    """How much a player's stat grew over the last `days` days (to the hour once rolled up)"""
+    since = int(time.time()) - days * DAY
+    row = conn.execute('''
+        SELECT COALESCE(SUM(delta), 0) FROM (
+            SELECT delta FROM stat_history WHERE player_uuid = :uuid AND stat_name = :stat AND ts >= :since
+            UNION ALL
+            SELECT delta FROM stat_rollups WHERE player_uuid = :uuid AND stat_name = :stat AND bucket >= :since
+        )
+    ''', {"uuid": uuid, "stat": stat, "since": since}).fetchone()
+    return row[0]
@@ -1,17 +1,359 @@
 # Core-X // Database Initializer
 # Handles schema creation and seed data.
 
-import sqlite3
 import os
 import yaml
+import db
 
 # FIX: Use the Environment Variable just like app.py does
 DB_NAME = os.getenv("DB_PATH", "corex.db")
 ACHIEVEMENTS_PATH = "achievements.yaml"
 
+# Schema changes applied on top of the base tables, keyed by the version they bring the DB to.
+# The current version is stored in PRAGMA user_version. Append new steps; never edit old ones.
+MIGRATIONS = {
+    1: [
+        # Leaderboards: WHERE stat_name = ? ORDER BY value DESC LIMIT 5
+        "CREATE INDEX IF NOT EXISTS idx_player_stats_leaderboard ON player_stats (stat_name, value DESC)",
+        # Dashboard/profile: a player's unlocks, newest first
+        "CREATE INDEX IF NOT EXISTS idx_unlocks_player ON unlocks (player_uuid, unlocked_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_players_gamertag ON players (gamertag)",
+    ],
+    2: [
+        # Last Minecraft server ping, written by the scanner's status poller
+        '''CREATE TABLE IF NOT EXISTS server_status (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            online INTEGER DEFAULT 0,
+            players_online INTEGER,
+            players_max INTEGER,
+            checked_at REAL
+        )''',
+        "INSERT OR IGNORE INTO server_status (id) VALUES (1)",
+    ],
+    3: [
+        # Bumped by the scanner whenever a commit changes what the pages show
+        "ALTER TABLE server_summary ADD COLUMN scan_generation INTEGER DEFAULT 0",
+        "ALTER TABLE server_summary ADD COLUMN generation_at REAL",
+    ],
+    4: [
+        # Stat history (see history.py): raw deltas, then hourly/daily rollups
+        '''CREATE TABLE IF NOT EXISTS stat_history (
+            player_uuid TEXT NOT NULL,
+            stat_name TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            delta INTEGER NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_stat_history_player ON stat_history (player_uuid, stat_name, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_stat_history_ts ON stat_history (ts)",
+        '''CREATE TABLE IF NOT EXISTS stat_rollups (
+            player_uuid TEXT NOT NULL,
+            stat_name TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            PRIMARY KEY (player_uuid, stat_name, bucket, resolution)
+        ) WITHOUT ROWID''',
+        "CREATE INDEX IF NOT EXISTS idx_stat_rollups_resolution ON stat_rollups (resolution, bucket)",
+    ],
+    5: [
+        # Gamertag search (see queries.search_filter): short queries match name prefixes
+        # through a NOCASE index, longer ones match anywhere through a trigram index
+        "DROP INDEX IF EXISTS idx_players_gamertag",
+        "CREATE INDEX IF NOT EXISTS idx_players_gamertag_nocase ON players (gamertag COLLATE NOCASE)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS player_search USING fts5(gamertag, content='players', content_rowid='rowid', tokenize='trigram')",
+        # Kept in step with players by triggers, so the scanner's upserts need no changes
+        '''CREATE TRIGGER IF NOT EXISTS players_search_insert AFTER INSERT ON players BEGIN
+            INSERT INTO player_search (rowid, gamertag) VALUES (new.rowid, new.gamertag);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS players_search_delete AFTER DELETE ON players BEGIN
+            INSERT INTO player_search (player_search, rowid, gamertag) VALUES ('delete', old.rowid, old.gamertag);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS players_search_update AFTER UPDATE OF gamertag ON players
+        WHEN old.gamertag IS NOT new.gamertag BEGIN
+            INSERT INTO player_search (player_search, rowid, gamertag) VALUES ('delete', old.rowid, old.gamertag);
+            INSERT INTO player_search (rowid, gamertag) VALUES (new.rowid, new.gamertag);
+        END''',
+        "INSERT INTO player_search (player_search) VALUES ('rebuild')",
+    ],
+    6: [
+        # Live-feed outbox (see events.py); AUTOINCREMENT so pruned ids are never handed out again
+        '''CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            type TEXT NOT NULL,
+            player_uuid TEXT,
+            payload TEXT NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_events_created ON events (created_at)",
+    ],
+    7: [
+        # Economy: GDP kept next to the era total, richest players read off an index
+        "ALTER TABLE server_summary ADD COLUMN gdp INTEGER DEFAULT 0",
+        # ORE_PRICES the stored net worths were computed with (see scanner.check_ore_prices)
+        "ALTER TABLE server_summary ADD COLUMN ore_prices TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_player_scores_net_worth ON player_scores (net_worth DESC, player_uuid)",
+    ],
+    8: [
+        # Leaderboard positions per player (see ranks.py), recomputed by the scanner
+        '''CREATE TABLE IF NOT EXISTS stat_ranks (
+            player_uuid TEXT NOT NULL,
+            stat_name TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            PRIMARY KEY (player_uuid, stat_name)
+        ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS stat_rank_totals (
+            stat_name TEXT PRIMARY KEY,
+            players INTEGER NOT NULL,
+            ranked_at REAL
+        )''',
+    ],
+    9: [
+        # Multiple servers (see scanner.SOURCES): each source's values are kept apart, and
+        # player_stats / player_progress hold the sum over all sources
+        '''CREATE TABLE IF NOT EXISTS source_stats (
+            source TEXT NOT NULL,
+            player_uuid TEXT NOT NULL,
+            stat_name TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (source, player_uuid, stat_name)
+        ) WITHOUT ROWID''',
+        # Per-server leaderboards: WHERE source = ? AND stat_name = ? ORDER BY value DESC LIMIT 5
+        "CREATE INDEX IF NOT EXISTS idx_source_stats_leaderboard ON source_stats (source, stat_name, value DESC)",
+        '''CREATE TABLE IF NOT EXISTS source_progress (
+            source TEXT NOT NULL,
+            player_uuid TEXT NOT NULL,
+            achievement_id TEXT NOT NULL,
+            current_value INTEGER NOT NULL,
+            PRIMARY KEY (source, player_uuid, achievement_id)
+        ) WITHOUT ROWID''',
+        # What was scanned so far came from the single MINECRAFT_STATS directory
+        "INSERT INTO source_stats (source, player_uuid, stat_name, value) SELECT 'default', player_uuid, stat_name, value FROM player_stats",
+        "INSERT INTO source_progress (source, player_uuid, achievement_id, current_value) SELECT 'default', player_uuid, achievement_id, current_value FROM player_progress",
+        # The manifest is keyed by source too (the scanner only creates it on its first pass)
+        '''CREATE TABLE IF NOT EXISTS scan_manifest (
+            file_name TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            content_hash TEXT,
+            rules_hash TEXT,
+            scanned_at TIMESTAMP
+        )''',
+        "ALTER TABLE scan_manifest RENAME TO scan_manifest_v8",
+        '''CREATE TABLE scan_manifest (
+            source TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            mtime_ns INTEGER,
+            size INTEGER,
+            content_hash TEXT,
+            rules_hash TEXT,
+            scanned_at TIMESTAMP,
+            PRIMARY KEY (source, file_name)
+        )''',
+        "INSERT INTO scan_manifest SELECT 'default', * FROM scan_manifest_v8",
+        "DROP TABLE scan_manifest_v8",
+    ],
+    10: [
+        # Scan generation in which a player's profile last changed, so export.py only
+        # re-renders those pages
+        "ALTER TABLE players ADD COLUMN changed_generation INTEGER DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_players_changed ON players (changed_generation)",
+    ],
+    11: [
+        # How far export.py got, so a restart carries on instead of re-rendering the site
+        '''CREATE TABLE IF NOT EXISTS export_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            export_dir TEXT,
+            generation INTEGER,
+            status TEXT,
+            definitions TEXT,
+            cursor_generation INTEGER DEFAULT -1,
+            cursor_uuid TEXT DEFAULT '',
+            refreshed_at REAL DEFAULT 0
+        )''',
+        "INSERT OR IGNORE INTO export_state (id) VALUES (1)",
+        # Profiles are exported in (changed_generation, uuid) order
+        "DROP INDEX IF EXISTS idx_players_changed",
+        "CREATE INDEX idx_players_changed ON players (changed_generation, uuid)",
+    ],
+    12: [
+        # player_search (v5) was keyed on the implicit rowid of players, which VACUUM may
+        # renumber. Rebuild players with an INTEGER PRIMARY KEY (a named, stable rowid),
+        # keeping the old rowids, and key the index on it.
+        "DROP TABLE IF EXISTS player_search",
+        '''CREATE TABLE players_v12 (
+            id INTEGER PRIMARY KEY,
+            uuid TEXT NOT NULL UNIQUE,
+            gamertag TEXT,
+            last_seen TIMESTAMP,
+            changed_generation INTEGER DEFAULT 0
+        )''',
+        "INSERT INTO players_v12 (id, uuid, gamertag, last_seen, changed_generation) SELECT rowid, uuid, gamertag, last_seen, changed_generation FROM players WHERE uuid IS NOT NULL",
+        "DROP TABLE players", # ...and its search triggers
+        "ALTER TABLE players_v12 RENAME TO players",
+        "CREATE INDEX idx_players_gamertag_nocase ON players (gamertag COLLATE NOCASE)",
+        "CREATE INDEX idx_players_changed ON players (changed_generation, uuid)",
+        "CREATE VIRTUAL TABLE player_search USING fts5(gamertag, content='players', content_rowid='id', tokenize='trigram')",
+        '''CREATE TRIGGER players_search_insert AFTER INSERT ON players BEGIN
+            INSERT INTO player_search (rowid, gamertag) VALUES (new.id, new.gamertag);
+        END''',
+        '''CREATE TRIGGER players_search_delete AFTER DELETE ON players BEGIN
+            INSERT INTO player_search (player_search, rowid, gamertag) VALUES ('delete', old.id, old.gamertag);
+        END''',
+        '''CREATE TRIGGER players_search_update AFTER UPDATE OF gamertag ON players
+        WHEN old.gamertag IS NOT new.gamertag BEGIN
+            INSERT INTO player_search (player_search, rowid, gamertag) VALUES ('delete', old.id, old.gamertag);
+            INSERT INTO player_search (rowid, gamertag) VALUES (new.id, new.gamertag);
+        END''',
+        "INSERT INTO player_search (player_search) VALUES ('rebuild')",
+    ],
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+def migrate(cursor):
+    """Brings the schema up to SCHEMA_VERSION, one recorded step at a time.
+
+    Each step and its user_version bump share a transaction, so a step interrupted
+    halfway is rolled back and re-run whole on the next start.
+    """
+    conn = cursor.connection
+    conn.commit() # The CREATE ... IF NOT EXISTS work above is safe to repeat
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for target in sorted(v for v in MIGRATIONS if v > version):
+        cursor.execute("BEGIN")
+        try:
+            for statement in MIGRATIONS[target]:
+                cursor.execute(statement)
+            cursor.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"🧱 Schema migrated to v{target}")
+
+def in_list(ids):
+    return ','.join('?' * len(ids))
+
+def load_achievements(path=ACHIEVEMENTS_PATH):
+    """Reads the YAML into definition rows (id, name, description, stat_key, threshold, icon, points).
+
+    Raises on a malformed file, so a bad edit never gets half-applied.
+    """
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f) or {}
+
+    rows = []
+    for ach in data.get('achievements', []):
+        rows.append((
+            ach['id'],
+            ach['name'],
+            ach['description'],
+            ach['stat_key'],
+            int(ach['threshold']),
+            ach['icon'],
+            int(ach.get('points', 50))
+        ))
+    ids = [row[0] for row in rows]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"duplicate achievement ids in {path}")
+    return rows
+
+def sync_definitions(cursor, rows, known_stats=None):
+    """Makes the definitions table match `rows` and patches the data derived from it.
+
+    Runs inside the caller's transaction. Stored stats are reused instead of
+    re-reading stats files wherever possible:
+      - removed achievements lose their unlocks and progress
+      - new (or re-keyed) achievements copy their progress from another achievement
+        on the same stat_key, or from `known_stats` ({stat_key: player_stats name})
+      - new and changed achievements are unlocked for every player whose stored
+        progress meets the threshold (earned unlocks are never taken back)
+      - affected players' player_scores rows get updated_at = NULL for the scanner to recompute
+
+    Returns None when nothing changed, else {"added", "changed", "removed", "unresolved"}
+    where unresolved are ids whose progress can only come from re-reading stats files.
+    """
+    current = {row[0]: tuple(row) for row in cursor.execute("SELECT id, name, description, stat_key, threshold, icon, points FROM definitions").fetchall()}
+    incoming = {row[0]: row for row in rows}
+    removed = sorted(current.keys() - incoming.keys())
+    # Kept in file order: definitions are listed by rowid, so new rows go in as written
+    added = [i for i in incoming if i not in current]
+    changed = [i for i in incoming if i in current and current[i] != incoming[i]]
+    if not (removed or added or changed):
+        return None
+
+    rekeyed = [i for i in changed if current[i][3] != incoming[i][3]]
+    repriced = [i for i in changed if current[i][6] != incoming[i][6]] + removed
+    stale_sql = "UPDATE player_scores SET updated_at = NULL WHERE player_uuid IN ({})"
+
+    # 1. Players holding an achievement whose points change or vanish need rescoring
+    if repriced:
+        cursor.execute(stale_sql.format(f"SELECT player_uuid FROM unlocks WHERE achievement_id IN ({in_list(repriced)})"), repriced)
+
+    # 2. Removed achievements take their unlocks and progress with them
+    if removed:
+        for table in ("unlocks", "player_progress", "source_progress"):
+            cursor.execute(f"DELETE FROM {table} WHERE achievement_id IN ({in_list(removed)})", removed)
+        cursor.execute(f"DELETE FROM definitions WHERE id IN ({in_list(removed)})", removed)
+
+    cursor.executemany('''
+    INSERT INTO definitions (id, name, description, stat_key, threshold, icon, points)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name,
+        description=excluded.description,
+        stat_key=excluded.stat_key,
+        threshold=excluded.threshold,
+        icon=excluded.icon,
+        points=excluded.points
+    ''', [incoming[i] for i in added + changed])
+
+    # 3. Progress for achievements measuring something new, from values already stored.
+    # Each source's progress is filled in first and the player's total summed from it,
+    # so the scanner's per-source deltas keep adding up.
+    if rekeyed:
+        for table in ("player_progress", "source_progress"):
+            cursor.execute(f"DELETE FROM {table} WHERE achievement_id IN ({in_list(rekeyed)})", rekeyed)
+    fresh = set(added + rekeyed)
+    unresolved = []
+    for rule_id in added + rekeyed:
+        key = incoming[rule_id][3]
+        sibling = next((i for i, row in incoming.items() if row[3] == key and i not in fresh), None)
+        if sibling:
+            cursor.execute('''
+                INSERT INTO source_progress (source, player_uuid, achievement_id, current_value)
+                SELECT source, player_uuid, ?, current_value FROM source_progress WHERE achievement_id = ?
+            ''', (rule_id, sibling))
+        elif known_stats and key in known_stats:
+            cursor.execute('''
+                INSERT INTO source_progress (source, player_uuid, achievement_id, current_value)
+                SELECT source, player_uuid, ?, value FROM source_stats WHERE stat_name = ?
+            ''', (rule_id, known_stats[key]))
+        else:
+            unresolved.append(rule_id)
+            continue
+        cursor.execute('''
+            INSERT INTO player_progress (player_uuid, achievement_id, current_value, updated_at)
+            SELECT player_uuid, achievement_id, SUM(current_value), CURRENT_TIMESTAMP FROM source_progress
+            WHERE achievement_id = ? GROUP BY player_uuid
+        ''', (rule_id,))
+
+    # 4. Unlocks earned under the new thresholds
+    reevaluate = added + changed
+    if reevaluate:
+        earned = f'''
+            SELECT p.player_uuid, d.id FROM player_progress p JOIN definitions d ON d.id = p.achievement_id
+            WHERE d.id IN ({in_list(reevaluate)}) AND p.current_value >= d.threshold
+            AND NOT EXISTS (SELECT 1 FROM unlocks u WHERE u.player_uuid = p.player_uuid AND u.achievement_id = d.id)
+        '''
+        cursor.execute(stale_sql.format(f"SELECT player_uuid FROM ({earned})"), reevaluate)
+        cursor.execute(f"INSERT INTO unlocks (player_uuid, achievement_id) {earned}", reevaluate)
+
+    print(f"📄 Definitions synced: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+    return {"added": added, "changed": changed, "removed": removed, "unresolved": unresolved}
+
 def init_system():
     # Connect to (or create) the database file
-    conn = sqlite3.connect(DB_NAME)
+    conn = db.connect(DB_NAME)
     cursor = conn.cursor()
     
     print(f"⚙️  Initializing Core-X Database at {DB_NAME}...")
@@ -72,41 +414,44 @@ def init_system():
     )
     ''')
 
-    # 6. Seed Initial Data from YAML
+    # 6. Create Table: PLAYER_SCORES (Gamerscore, maintained by the scanner)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS player_scores (
+        player_uuid TEXT PRIMARY KEY,
+        score INTEGER DEFAULT 0,
+        unlock_count INTEGER DEFAULT 0,
+        net_worth INTEGER DEFAULT 0,
+        rank_tier TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_scores_score ON player_scores (score DESC, player_uuid)")
+
+    # 7. Create Table: SERVER_SUMMARY (Single row of server-wide totals)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS server_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_score INTEGER DEFAULT 0,
+        updated_at TIMESTAMP
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO server_summary (id) VALUES (1)")
+
+    # 8. Indexes & Later Schema Changes
+    migrate(cursor)
+
+    # 9. Seed Initial Data from YAML
     if os.path.exists(ACHIEVEMENTS_PATH):
         print(f"📄 Loading achievements from {ACHIEVEMENTS_PATH}...")
-        with open(ACHIEVEMENTS_PATH, 'r') as f:
-            data = yaml.safe_load(f)
-
-        achievements_data = []
-        for ach in data.get('achievements', []):
-            achievements_data.append((
-                ach['id'],
-                ach['name'],
-                ach['description'],
-                ach['stat_key'],
-                ach['threshold'],
-                ach['icon'],
-                ach.get('points', 50)
-            ))
-
-        cursor.executemany('''
-        INSERT INTO definitions (id, name, description, stat_key, threshold, icon, points)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(id) DO UPDATE SET
-            name=excluded.name,
-            description=excluded.description,
-            stat_key=excluded.stat_key,
-            threshold=excluded.threshold,
-            icon=excluded.icon,
-            points=excluded.points
-        ''', achievements_data)
+        sync_definitions(cursor, load_achievements())
     else:
         print(f"⚠️  Warning: {ACHIEVEMENTS_PATH} not found. Skipping seed.")
 
     conn.commit()
+    # Refresh planner statistics so the new indexes get used
+    cursor.execute("PRAGMA optimize")
     conn.close()
-    print("✅ Database System Online.")
+    print(f"✅ Database System Online (schema v{SCHEMA_VERSION}).")
 
 if __name__ == "__main__":
     init_system()
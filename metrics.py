@@ -0,0 +1,162 @@
+# Core-X // Metrics Module
+# Counters, gauges and histograms for the scanner and the web workers. Every
+# process keeps its own and periodically writes a snapshot to METRICS_DIR;
+# /metrics adds the snapshots up, so the numbers cover the scanner process and
+# all gunicorn workers no matter which worker serves the scrape.
+
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# CONFIGURATION
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "corex-metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))   # Seconds between snapshot writes
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SCAN_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "corex_scan_passes_total": ("counter", "Scan passes completed", None),
+    "corex_scan_files_total": ("counter", "Stats files considered by the scanner, by source and result", None),
+    "corex_scan_rows_written_total": ("counter", "Rows written by the scanner, by table", None),
+    "corex_scan_unlocks_total": ("counter", "Achievements unlocked", None),
+    "corex_scan_errors_total": ("counter", "Errors caught by the scanner, by stage", None),
+    "corex_scan_last_pass_timestamp_seconds": ("gauge", "Unix time the last scan pass finished", None),
+    "corex_scan_pass_seconds": ("histogram", "Duration of whole scan passes", SCAN_BUCKETS),
+    "corex_scan_phase_seconds": ("histogram", "Time spent per scan pass in each phase (summed over sources)", SCAN_BUCKETS),
+    "corex_scan_source_seconds": ("histogram", "Time spent per scan pass on each source", SCAN_BUCKETS),
+    "corex_export_files_total": ("counter", "Pages and JSON files written to EXPORT_DIR", None),
+    "corex_http_request_duration_seconds": ("histogram", "Web request latency, by route", LATENCY_BUCKETS),
+}
+
+_lock = threading.Lock()
+_state = {"counters": {}, "gauges": {}, "histograms": {}, "flushed_at": 0.0}
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def inc(name, value=1, **labels):
+    if not value:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _state["counters"][key] = _state["counters"].get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _state["gauges"][_key(name, labels)] = value
+
+def observe(name, value, **labels):
+    """Adds one sample to a histogram declared in METRICS"""
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _lock:
+        hist = _state["histograms"].get(key)
+        if hist is None:
+            hist = _state["histograms"][key] = [[0] * len(buckets), 0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist[0][i] += 1
+                break
+        hist[1] += value
+        hist[2] += 1
+
+def histogram_sums(name):
+    """{labels: total observed} for one histogram in this process (used by bench.py)"""
+    with _lock:
+        return {labels: hist[1] for (n, labels), hist in _state["histograms"].items() if n == name}
+
+@contextmanager
+def stopwatch(timings, phase):
+    """Adds the wall time of the block to timings[phase]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+def flush(force=False):
+    """Writes this process's snapshot, at most every METRICS_FLUSH_INTERVAL unless forced.
+
+    Metrics must never break a scan or a request, so I/O errors are ignored.
+    """
+    now = time.time()
+    if not force and now - _state["flushed_at"] < METRICS_FLUSH_INTERVAL:
+        return
+    with _lock:
+        _state["flushed_at"] = now
+        snapshot = json.dumps({kind: [[name, dict(labels), value] for (name, labels), value in _state[kind].items()]
+                               for kind in ("counters", "gauges", "histograms")})
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(snapshot)
+        os.replace(f"{path}.tmp", path) # Readers never see a half-written file
+    except OSError:
+        pass
+
+def collect():
+    """Merges every process's snapshot: counters and histograms add up, gauges take the max"""
+    merged = {"counters": {}, "gauges": {}, "histograms": {}}
+    try:
+        files = [e.path for e in os.scandir(METRICS_DIR) if e.name.endswith(".json")]
+    except FileNotFoundError:
+        files = []
+
+    for path in files:
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in snapshot.get("counters", []):
+            key = _key(name, labels)
+            merged["counters"][key] = merged["counters"].get(key, 0) + value
+        for name, labels, value in snapshot.get("gauges", []):
+            key = _key(name, labels)
+            merged["gauges"][key] = max(merged["gauges"].get(key, value), value)
+        for name, labels, (counts, total, count) in snapshot.get("histograms", []):
+            key = _key(name, labels)
+            hist = merged["histograms"].setdefault(key, [[0] * len(counts), 0.0, 0])
+            hist[0] = [a + b for a, b in zip(hist[0], counts)]
+            hist[1] += total
+            hist[2] += count
+    return merged
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def render():
+    """All processes' metrics in the Prometheus text exposition format"""
+    merged = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        source = merged[kind + "s"]
+        series = sorted((labels, value) for (n, labels), value in source.items() if n == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
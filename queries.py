@@ -0,0 +1,253 @@
+# Core-X // Query Module
+# Read-side queries shared by the HTML pages and the JSON API. Results are
+# memoized per scan generation, so both surfaces hit SQLite once per change.
+
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from history import period_total
+from ranks import player_ranks
+
+# CONFIGURATION
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))   # Query results kept per worker
+
+class GenerationCache:
+    """Thread-safe LRU whose entries are only valid for the tag they were stored with"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, tag):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != tag:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, tag, value):
+        with self.lock:
+            self.entries[key] = (tag, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+query_cache = GenerationCache(QUERY_CACHE_SIZE)
+
+def get_scan_generation(conn):
+    """(generation, unix time it was reached) as last committed by the scanner"""
+    row = conn.execute("SELECT scan_generation, generation_at FROM server_summary WHERE id = 1").fetchone()
+    return (row[0] or 0, row[1]) if row else (0, None)
+
+def cached_query(fn):
+    """Memoizes fn(conn, *args) until the scanner commits a new generation.
+
+    Results are shared between requests, so callers must not mutate them.
+    """
+    @wraps(fn)
+    def wrapper(conn, *args):
+        tag = get_scan_generation(conn)[0]
+        key = (fn.__name__,) + args
+        result = query_cache.get(key, tag)
+        if result is None:
+            result = fn(conn, *args)
+            query_cache.put(key, tag, result)
+        return result
+    return wrapper
+
+def fetch_grouped(conn, sql, uuids):
+    """Runs `sql` (with an IN ({}) placeholder on player_uuid) for a page of players and groups rows by player"""
+    grouped = {}
+    if not uuids:
+        return grouped
+    for row in conn.execute(sql.format(','.join('?' * len(uuids))), tuple(uuids)).fetchall():
+        grouped.setdefault(row['player_uuid'], []).append(row)
+    return grouped
+
+def build_achievements(definitions, unlocks, progress_rows):
+    """Unlocked achievements (newest first) followed by the locked ones with their progress"""
+    defs = {d['id']: d for d in definitions}
+    progress = {row['achievement_id']: row['current_value'] for row in progress_rows}
+
+    all_achievements = []
+    unlocked_ids = set()
+    for u in unlocks:
+        d = defs.get(u['achievement_id'])
+        if d is None: continue
+        unlocked_ids.add(d['id'])
+        all_achievements.append({"name": d['name'], "description": d['description'], "icon": d['icon'], "unlocked_at": u['unlocked_at'], "is_unlocked": True, "progress": 100, "current": d['threshold'], "total": d['threshold'], "points": d['points']})
+    for d in definitions:
+        if d['id'] in unlocked_ids: continue
+        current = progress.get(d['id']) or 0
+        percent = min(100, int((current / d['threshold']) * 100))
+        all_achievements.append({"name": d['name'], "description": d['description'], "icon": d['icon'], "is_unlocked": False, "progress": percent, "current": current, "total": d['threshold'], "points": d['points']})
+    return all_achievements
+
+# --- Players ---
+# player_scores is kept up to date by the scanner; ordering walks its (score DESC, player_uuid) index
+
+PLAYER_SQL = '''
+    SELECT p.uuid, p.gamertag, s.score, s.unlock_count, s.net_worth, s.rank_tier
+    FROM player_scores s
+    JOIN players p ON p.uuid = s.player_uuid
+'''
+
+def player_summary(row):
+    return {"uuid": row['uuid'], "name": row['gamertag'] if row['gamertag'] else row['uuid'][:8],
+            "score": row['score'], "unlock_count": row['unlock_count'], "net_worth": row['net_worth'], "rank_tier": row['rank_tier']}
+
+# FTS5's trigram tokenizer can't match anything shorter than this
+SEARCH_MIN_SUBSTRING = 3
+
+def like_prefix(text):
+    """LIKE pattern for names starting with `text` (underscores are common in gamertags)"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def search_filter(search):
+    """WHERE fragment on `players p` (and its args) for a case-insensitive gamertag search.
+
+    Queries of SEARCH_MIN_SUBSTRING+ characters match anywhere in the name through
+    the player_search trigram index; shorter ones match the start of the name
+    through the NOCASE index. Neither scans the players table.
+    """
+    if len(search) >= SEARCH_MIN_SUBSTRING:
+        return "p.id IN (SELECT rowid FROM player_search WHERE player_search MATCH ?)", ['"' + search.replace('"', '""') + '"']
+    return "p.gamertag LIKE ? ESCAPE '\\'", [like_prefix(search)]
+
+@cached_query
+def count_players(conn, search=''):
+    if search:
+        where, args = search_filter(search)
+        return conn.execute(f"SELECT COUNT(*) FROM players p WHERE {where}", args).fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+@cached_query
+def players_by_offset(conn, search, limit, offset):
+    """One numbered page of the ranking, for the HTML pager"""
+    sql, args = PLAYER_SQL, []
+    if search:
+        where, args = search_filter(search)
+        sql += f" WHERE {where} "
+    sql += " ORDER BY s.score DESC, s.player_uuid LIMIT ? OFFSET ? "
+    args.extend([limit, offset])
+    return [player_summary(row) for row in conn.execute(sql, args).fetchall()]
+
+@cached_query
+def players_after(conn, search, limit, cursor=None):
+    """Up to `limit` players ranked after `cursor` = (score, uuid).
+
+    The `score <= ?` bound lets SQLite seek idx_player_scores_score to the cursor
+    instead of walking the index from the top, so deep pages cost the same as the first.
+    """
+    sql, where, args = PLAYER_SQL, [], []
+    if search:
+        clause, args = search_filter(search)
+        where.append(clause)
+    if cursor is not None:
+        where.append("s.score <= ? AND (s.score < ? OR s.player_uuid > ?)")
+        args.extend([cursor[0], cursor[0], cursor[1]])
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY s.score DESC, s.player_uuid LIMIT ? "
+    args.append(limit)
+    return [player_summary(row) for row in conn.execute(sql, args).fetchall()]
+
+def autocomplete(conn, text, limit):
+    """Up to `limit` players for a search box: names starting with `text` (alphabetically),
+    then names containing it. Both steps stop at `limit`, so large tables stay fast.
+    """
+    prefix = like_prefix(text)
+    rows = conn.execute("SELECT uuid, gamertag FROM players WHERE gamertag LIKE ? ESCAPE '\\' ORDER BY gamertag COLLATE NOCASE LIMIT ?", (prefix, limit)).fetchall()
+    if len(rows) < limit and len(text) >= SEARCH_MIN_SUBSTRING:
+        where, args = search_filter(text)
+        rows += conn.execute(f"SELECT p.uuid, p.gamertag FROM players p WHERE {where} AND p.gamertag NOT LIKE ? ESCAPE '\\' LIMIT ?", args + [prefix, limit - len(rows)]).fetchall()
+    return [{"uuid": row['uuid'], "name": row['gamertag']} for row in rows]
+
+@cached_query
+def definitions(conn):
+    return [dict(row) for row in conn.execute("SELECT id, name, description, icon, threshold, points FROM definitions").fetchall()]
+
+@cached_query
+def player_details(conn, uuids):
+    """{uuid: {"stats": {...}, "achievements": [...]}} for a tuple of players, fetched in one batch"""
+    defs = definitions(conn)
+    stats_by_player = fetch_grouped(conn, "SELECT player_uuid, stat_name, value FROM player_stats WHERE player_uuid IN ({})", uuids)
+    unlocks_by_player = fetch_grouped(conn, "SELECT u.player_uuid, u.achievement_id, u.unlocked_at FROM unlocks u WHERE u.player_uuid IN ({}) ORDER BY u.unlocked_at DESC", uuids)
+    progress_by_player = fetch_grouped(conn, "SELECT player_uuid, achievement_id, current_value FROM player_progress WHERE player_uuid IN ({})", uuids)
+    return {uuid: {
+        "stats": {row['stat_name']: row['value'] for row in stats_by_player.get(uuid, [])},
+        "achievements": build_achievements(defs, unlocks_by_player.get(uuid, []), progress_by_player.get(uuid, []))
+    } for uuid in uuids}
+
+@cached_query
+def player_profile(conn, uuid):
+    """Everything shown on a profile page, or None for an unknown player"""
+    row = conn.execute("SELECT p.gamertag, p.uuid, COALESCE(s.score, 0) as score, COALESCE(s.net_worth, 0) as net_worth FROM players p LEFT JOIN player_scores s ON s.player_uuid = p.uuid WHERE p.uuid = ?", (uuid,)).fetchone()
+    if not row:
+        return None
+
+    details = player_details(conn, (uuid,))[uuid]
+    return {
+        "uuid": row['uuid'], "gamertag": row['gamertag'], "score": row['score'],
+        "stats": details['stats'],
+        "net_worth": row['net_worth'],
+        "achievements": details['achievements'],
+        "ranks": player_ranks(conn, uuid),
+        "week": {stat: period_total(conn, stat, uuid, 7) for stat in ('total_kills', 'total_deaths', 'play_time_ticks', 'distance_walked')}
+    }
+
+# --- Server ---
+
+@cached_query
+def global_score(conn):
+    row = conn.execute("SELECT total_score FROM server_summary WHERE id = 1").fetchone()
+    return row[0] if row and row[0] else 0
+
+@cached_query
+def top_players(conn, stat, limit=5, source=None):
+    """The `limit` best players on a stat: summed over every server, or on one source.
+    Either way it's a single walk down a (stat_name, value DESC) index."""
+    if source is None:
+        rows = conn.execute("SELECT p.uuid, p.gamertag, s.value FROM player_stats s JOIN players p ON s.player_uuid = p.uuid WHERE s.stat_name = ? ORDER BY s.value DESC LIMIT ?", (stat, limit)).fetchall()
+    else:
+        rows = conn.execute("SELECT p.uuid, p.gamertag, s.value FROM source_stats s JOIN players p ON s.player_uuid = p.uuid WHERE s.source = ? AND s.stat_name = ? ORDER BY s.value DESC LIMIT ?", (source, stat, limit)).fetchall()
+    return [{"rank": i + 1, "uuid": r['uuid'], "name": r['gamertag'], "value": r['value']} for i, r in enumerate(rows)]
+
+@cached_query
+def server_totals(conn):
+    """Server-wide totals plus the economy (GDP and the three richest players).
+
+    Net worth is kept per player by the scanner and the GDP in server_summary,
+    so nothing here grows with the player count except the stat sums' index scan.
+    """
+    agg_query = '''
+        SELECT stat_name, SUM(value) as total
+        FROM player_stats
+        WHERE stat_name IN ('total_deaths', 'play_time_ticks', 'distance_walked')
+        GROUP BY stat_name
+    '''
+    aggs = {row['stat_name']: row['total'] for row in conn.execute(agg_query).fetchall()}
+
+    gdp = conn.execute("SELECT gdp FROM server_summary WHERE id = 1").fetchone()
+    # LEFT JOIN: a player missing from the usercache still ranks, shown by UUID
+    rich_list = conn.execute('''
+        SELECT s.player_uuid AS uuid, p.gamertag, s.score, s.unlock_count, s.net_worth, s.rank_tier
+        FROM player_scores s
+        LEFT JOIN players p ON p.uuid = s.player_uuid
+        WHERE s.net_worth > 0 ORDER BY s.net_worth DESC, s.player_uuid LIMIT 3
+    ''').fetchall()
+
+    return {
+        "gdp": gdp[0] if gdp and gdp[0] else 0,
+        "total_deaths": aggs.get('total_deaths', 0),
+        "play_time_ticks": aggs.get('play_time_ticks', 0),
+        "distance_walked": aggs.get('distance_walked', 0),
+        "oligarchs": [{"uuid": p['uuid'], "name": p['name'], "net_worth": p['net_worth']} for p in map(player_summary, rich_list)]
+    }
@@ -0,0 +1,58 @@
+# Core-X // Ranks Module
+# Every player's position on each leaderboard stat. The scanner recomputes the
+# table (at most every RANKS_INTERVAL) so a profile can show "#312 of 40,000"
+# with a primary-key lookup instead of counting everyone ahead of the player.
+
+import os
+import math
+import time
+
+# CONFIGURATION
+RANKS_INTERVAL = int(os.getenv("RANKS_INTERVAL", 60))   # Seconds between rank recomputations
+
+_ranks = {"at": 0, "dirty": True}
+
+def mark_dirty():
+    """Called by the scanner whenever player_stats changed"""
+    _ranks["dirty"] = True
+
+def refresh(cursor, stat_names, now=None):
+    """Recomputes stat_ranks for `stat_names` (ties share a rank); only moved rows are written"""
+    marks = ','.join('?' * len(stat_names))
+    cursor.execute(f"DELETE FROM stat_ranks WHERE stat_name NOT IN ({marks})", stat_names)
+    cursor.execute(f"DELETE FROM stat_rank_totals WHERE stat_name NOT IN ({marks})", stat_names)
+    if not stat_names:
+        return
+    cursor.execute(f'''
+        INSERT INTO stat_ranks (stat_name, player_uuid, rank)
+        SELECT r.stat_name, r.player_uuid, r.rank FROM (
+            SELECT stat_name, player_uuid, RANK() OVER (PARTITION BY stat_name ORDER BY value DESC) AS rank
+            FROM player_stats WHERE stat_name IN ({marks})
+        ) r
+        LEFT JOIN stat_ranks old ON old.player_uuid = r.player_uuid AND old.stat_name = r.stat_name
+        WHERE old.rank IS NOT r.rank
+        ON CONFLICT(player_uuid, stat_name) DO UPDATE SET rank = excluded.rank
+    ''', stat_names)
+    cursor.execute(f'''
+        INSERT INTO stat_rank_totals (stat_name, players, ranked_at)
+        SELECT stat_name, COUNT(*), ? FROM player_stats WHERE stat_name IN ({marks}) GROUP BY stat_name
+        ON CONFLICT(stat_name) DO UPDATE SET players = excluded.players, ranked_at = excluded.ranked_at
+    ''', [now or time.time()] + list(stat_names))
+
+def maybe_refresh(cursor, stat_names):
+    """Runs refresh() if stats changed and RANKS_INTERVAL has passed. Returns True if it ran."""
+    if not _ranks["dirty"] or time.time() - _ranks["at"] < RANKS_INTERVAL:
+        return False
+    refresh(cursor, stat_names)
+    _ranks["at"] = time.time()
+    _ranks["dirty"] = False
+    return True
+
+def player_ranks(conn, uuid):
+    """{stat_name: {"rank", "of", "top_percent"}} for one player, as of the last refresh"""
+    rows = conn.execute('''
+        SELECT r.stat_name, r.rank, t.players FROM stat_ranks r
+        JOIN stat_rank_totals t ON t.stat_name = r.stat_name
+        WHERE r.player_uuid = ?
+    ''', (uuid,)).fetchall()
+    return {stat: {"rank": rank, "of": players, "top_percent": math.ceil(rank * 100 / players)} for stat, rank, players in rows}
@@ -0,0 +1,75 @@
+# Core-X // Stat Registry Module
+# The stats harvested into player_stats, declared in stats.yaml: where each
+# one lives in a stats file, how it is displayed, and whether it gets a
+# leaderboard card (and per-player rank positions, see ranks.py).
+
+import yaml
+
+# CONFIGURATION
+STATS_REGISTRY_PATH = "stats.yaml"
+
+# Display formats for leaderboard values
+UNITS = {
+    "count": lambda value: f"{value:,}",
+    "hours": lambda value: f"{round(value / 72000, 1)} hrs",   # from ticks
+    "km": lambda value: f"{round(value / 100000, 2)} km",      # from centimetres
+}
+
+def split_stat_key(key):
+    """(category, item) for a stat_key, or None if it isn't one.
+
+    A stat_key is either a custom stat ("minecraft:walk_one_cm", stored under
+    minecraft:custom) or a category/item pair ("minecraft:mined:minecraft:stone",
+    stored as stats["minecraft:mined"]["minecraft:stone"]).
+    """
+    parts = key.split(":")
+    if len(parts) == 2:
+        return "minecraft:custom", key
+    if len(parts) == 4:
+        return f"{parts[0]}:{parts[1]}", f"{parts[2]}:{parts[3]}"
+    return None
+
+def load_registry(path=STATS_REGISTRY_PATH):
+    """Reads stats.yaml into [{name, stat_key, category, item, label, unit, leaderboard}, ...].
+
+    Raises on anything the scanner couldn't harvest, so a bad entry stops startup
+    instead of silently dropping a stat.
+    """
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f) or {}
+
+    registry = []
+    for entry in data.get('stats', []):
+        split = split_stat_key(entry['stat_key'])
+        if split is None:
+            raise ValueError(f"{path}: unsupported stat_key '{entry['stat_key']}' for {entry['name']}")
+        unit = entry.get('unit', 'count')
+        if unit not in UNITS:
+            raise ValueError(f"{path}: unknown unit '{unit}' for {entry['name']}")
+        category, item = split
+        registry.append({
+            "name": entry['name'],
+            # Custom stats are keyed the short way, like achievements.yaml rules
+            "stat_key": item if category == 'minecraft:custom' else f"{category}:{item}",
+            "category": category,
+            "item": item,
+            "label": entry.get('label', entry['name']),
+            "unit": unit,
+            "leaderboard": bool(entry.get('leaderboard', False)),
+        })
+    names = [stat['name'] for stat in registry]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: duplicate stat names")
+    return registry
+
+STATS = load_registry()
+
+# Global stats harvested for leaderboards: (stat_name, category, item)
+HARVEST = [(stat['name'], stat['category'], stat['item']) for stat in STATS]
+# Where each harvested stat's value can be found by a rule on the same stat_key
+HARVEST_KEYS = {stat['stat_key']: stat['name'] for stat in STATS}
+# Stats with a leaderboard card, in file order
+LEADERBOARDS = [stat for stat in STATS if stat['leaderboard']]
+
+def format_value(stat, value):
+    return UNITS[stat['unit']](value)
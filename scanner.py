@@ -3,18 +3,110 @@
 
 import os
 import json
-import sqlite3
 import time
+import hashlib
+import re
+import argparse
+import threading
+import multiprocessing
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from watcher import InotifyWatcher, WatchUnavailable
+from server_status import start_poller
+import history
+import events
+import ranks
+import export
+import metrics
+import db
+from init_db import load_achievements, sync_definitions, ACHIEVEMENTS_PATH
+from registry import HARVEST, HARVEST_KEYS, LEADERBOARDS, split_stat_key
+
+try:
+    # Optional faster decoder for full parses
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 # CONFIGURATION
 STATS_PATH = os.getenv("MINECRAFT_STATS", os.path.expanduser("~/minecraft/data/world/stats"))
 USERCACHE_PATH = os.getenv("MINECRAFT_CACHE", os.path.expanduser("~/minecraft/data/usercache.json"))
+# Several servers in one database: "survival=/data/survival/stats,creative=/data/creative/stats:/data/creative/usercache.json"
+# (name=stats directory, optionally :usercache.json, which defaults to MINECRAFT_CACHE).
+# Unset, MINECRAFT_STATS is the only source, named "default".
+MINECRAFT_SOURCES = os.getenv("MINECRAFT_SOURCES", "")
+DEFAULT_SOURCE = "default"
 DB_NAME = os.getenv("DB_PATH", "corex.db")
 SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL", 5))
+# Set SCAN_HASH=1 to also compare file contents when mtime/size change (e.g. touched but identical files)
+SCAN_HASH = os.getenv("SCAN_HASH", "0") == "1"
+# watch = react to inotify events (falls back to polling if unavailable), poll = fixed SCAN_INTERVAL loop
+SCAN_MODE = os.getenv("SCAN_MODE", "watch")
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", 1.0))
+WATCH_RESYNC = int(os.getenv("WATCH_RESYNC", 300))
+# Worker processes used to parse stats files; 1 keeps parsing in the scanner process
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 1))
+# Players written per transaction; a normal pass fits in one, a cold scan commits every N
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", 1000))
+# Below this many changed files a pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+# partial = pull only the values the harvest/rules need out of each file; full = decode the whole file;
+# auto = partial for big files, full (orjson if installed) for small ones where decoding is cheaper
+SCAN_PARSER = os.getenv("SCAN_PARSER", "auto")
+PARTIAL_MIN_BYTES = 32 * 1024
+
+def parse_sources(spec):
+    """[(name, stats_path, usercache_path), ...] from MINECRAFT_SOURCES"""
+    if not spec.strip():
+        return [(DEFAULT_SOURCE, STATS_PATH, USERCACHE_PATH)]
+    sources = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, paths = item.partition('=')
+        stats_path, _, usercache = paths.partition(':')
+        if not name.strip() or not stats_path.strip():
+            raise ValueError(f"MINECRAFT_SOURCES: expected name=stats_dir[:usercache.json], got '{item}'")
+        sources.append((name.strip(), stats_path.strip(), usercache.strip() or USERCACHE_PATH))
+    names = [source[0] for source in sources]
+    if len(set(names)) != len(names):
+        raise ValueError("MINECRAFT_SOURCES: duplicate source names")
+    return sources
+
+SOURCES = parse_sources(MINECRAFT_SOURCES)
+SOURCE_NAMES = [source[0] for source in SOURCES]
+# Every server's usercache.json, each read once even if shared
+USERCACHE_PATHS = list(dict.fromkeys(source[2] for source in SOURCES))
+
+# Gamerscore needed for each rank, highest first. Stored as player_scores.rank_tier and
+# shown by get_player_rank() in app.py; badges are static/ranks/<title>.svg
+RANK_TIERS = [(2000, "Warlord"), (1000, "Veteran"), (500, "Scout"), (0, "Recruit")]
+
+# Ores that make up a player's net worth: (key, label, price, harvested stats counted).
+# Prices can be overridden with ORE_PRICES, e.g. "diamond=1500,gold=300".
+ORES = [
+    ('ancient_debris', "Ancient Debris", 5000, ('mined_ancient_debris',)),
+    ('diamond', "Diamond Ore", 1000, ('mined_diamond_ore', 'mined_deepslate_diamond_ore')),
+    ('emerald', "Emerald Ore", 2500, ('mined_emerald_ore', 'mined_deepslate_emerald_ore')),
+    ('gold', "Gold Ore", 250, ('mined_gold_ore', 'mined_deepslate_gold_ore')),
+]
+
+def parse_ore_prices(spec):
+    """{ore key: price} from "key=price,key=price"; unknown ores are rejected so typos don't go unnoticed"""
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, price = item.partition('=')
+        if key.strip() not in {ore[0] for ore in ORES}:
+            raise ValueError(f"ORE_PRICES: unknown ore '{key.strip()}'")
+        prices[key.strip()] = int(price)
+    return prices
+
+ORE_PRICES = {key: price for key, _, price, _ in ORES}
+ORE_PRICES.update(parse_ore_prices(os.getenv("ORE_PRICES", "")))
+
+# Stats that feed calculate_net_worth(); a change in any of them re-prices the player
+NET_WORTH_STATS = {stat for _, _, _, stats in ORES for stat in stats}
 
 def get_db_connection():
-    return sqlite3.connect(DB_NAME)
+    return db.connect(DB_NAME)
 
 def init_tables(cursor):
     """Creates necessary tables on the fly if they don't exist"""
@@ -36,152 +128,862 @@ def init_tables(cursor):
         PRIMARY KEY (player_uuid, stat_name)
     )
     ''')
+    # 3. Scan Manifest (Incremental Scanning)
+    # One row per source and stats file; a file is only re-parsed when its signature changes.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scan_manifest (
+        source TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        mtime_ns INTEGER,
+        size INTEGER,
+        content_hash TEXT,
+        rules_hash TEXT,
+        scanned_at TIMESTAMP,
+        PRIMARY KEY (source, file_name)
+    )
+    ''')
 
-def sync_identities(cursor):
-    """Reads Minecraft usercache.json to map UUIDs to Names"""
-    if not os.path.exists(USERCACHE_PATH):
+def mining_log(stats):
+    """[{"name", "count", "value"}, ...] per ore, as priced by ORE_PRICES"""
+    return [{"name": label, "count": sum(stats.get(stat, 0) for stat in ore_stats), "value": ORE_PRICES[key]}
+            for key, label, _, ore_stats in ORES]
+
+def calculate_net_worth(stats):
+    return sum(ore['count'] * ore['value'] for ore in mining_log(stats))
+
+def rank_tier(score):
+    return next(title for floor, title in RANK_TIERS if score >= floor)
+
+def chunked(items, size=500):
+    """Splits a list into chunks that stay under SQLite's bound-parameter limit"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def rules_fingerprint(rules):
+    """Hash of the achievement rules, for reusing their compiled form"""
+    return hashlib.sha1(repr(sorted(rules)).encode()).hexdigest()
+
+def stat_keys_fingerprint(stat_keys):
+    """Hash of the stats the harvest and the rules read. Stored per file in the manifest: a
+    file scanned before a new stat was needed must be re-read. Threshold and point changes
+    don't count, sync_definitions() applies those from stored progress.
+    """
+    return hashlib.sha1(repr(sorted(set(stat_keys) | HARVEST_KEYS.keys())).encode()).hexdigest()
+
+def compile_rules(rules):
+    """Groups definition rows into {category: [(item, threshold, rule_id), ...]}.
+
+    See registry.split_stat_key() for the stat_key format. Anything else is
+    rejected here instead of failing for every player.
+    """
+    compiled = {}
+    for rule_id, name, threshold, key, icon in rules:
+        split = split_stat_key(key)
+        if split is None:
+            print(f"⚠️  Rule {rule_id} rejected: unsupported stat_key '{key}'")
+            continue
+        category, item = split
+        compiled.setdefault(category, []).append((item, threshold, rule_id))
+    return compiled
+
+_compiled_rules = {"fingerprint": None, "rules": {}}
+
+def get_compiled_rules(rules, fingerprint):
+    """Compiles the rules once and reuses them until the definitions change"""
+    if _compiled_rules["fingerprint"] != fingerprint:
+        _compiled_rules["rules"] = compile_rules(rules)
+        _compiled_rules["fingerprint"] = fingerprint
+    return _compiled_rules["rules"]
+
+def evaluate_rules(compiled, stats):
+    """Returns {rule_id: value} for one player's parsed "stats" object"""
+    progress = {}
+    for category, checks in compiled.items():
+        values = stats.get(category, {})
+        for item, threshold, rule_id in checks:
+            progress[rule_id] = values.get(item, 0)
+    return progress
+
+def harvest_stats(stats):
+    """Pulls the HARVEST values out of a player's parsed "stats" object"""
+    return tuple(stats.get(category, {}).get(item, 0) for _, category, item in HARVEST)
+
+def needed_paths(compiled):
+    """{category: {item, ...}} of every value the harvest and the rules read"""
+    needed = {}
+    for _, category, item in HARVEST:
+        needed.setdefault(category, set()).add(item)
+    for category, checks in compiled.items():
+        needed.setdefault(category, set()).update(item for item, _, _ in checks)
+    return needed
+
+def compile_extractor(needed):
+    """Precomputes the quoted byte keys extract_stats() searches for:
+    [(category, b'"category"', [(item, b'"item"'), ...]), ...]
+    """
+    return [
+        (category, f'"{category}"'.encode(), [(item, f'"{item}"'.encode()) for item in sorted(items)])
+        for category, items in sorted(needed.items())
+    ]
+
+_OBJECT_OPEN = re.compile(rb'\s*:\s*\{')
+_INT_VALUE = re.compile(rb'\s*:\s*(-?\d+)')
+_WHITESPACE = b' \t\r\n'
+
+def _is_complete(raw):
+    """Cheap check that the bytes hold one whole JSON object (not a file caught mid-write)"""
+    first, last = 0, len(raw) - 1
+    while first <= last and raw[first] in _WHITESPACE: first += 1
+    while last >= first and raw[last] in _WHITESPACE: last -= 1
+    return first < last and raw[first] == ord('{') and raw[last] == ord('}')
+
+def extract_stats(raw, extractor):
+    """Pulls only the needed values out of a stats file's bytes.
+
+    Category objects in a stats file are flat {"ns:item": int, ...} maps, so a
+    category spans from its key to the next closing brace, and each wanted item
+    is a substring search inside that span. Nothing else is decoded.
+
+    Returns a {category: {item: value}} "stats" object, or None when the file
+    doesn't look like a complete stats file (the caller then parses it fully).
+    """
+    if not _is_complete(raw) or b'"stats"' not in raw:
+        return None # Truncated mid-write, or not the format we know
+
+    stats = {}
+    for category, category_key, items in extractor:
+        pos = raw.find(category_key)
+        opened = None
+        while pos != -1:
+            opened = _OBJECT_OPEN.match(raw, pos + len(category_key))
+            if opened:
+                break
+            pos = raw.find(category_key, pos + 1)
+        if not opened:
+            continue
+
+        start = opened.end()
+        end = raw.find(b'}', start)
+        if end == -1:
+            return None
+
+        values = {}
+        for item, item_key in items:
+            at = raw.find(item_key, start, end)
+            if at != -1:
+                value = _INT_VALUE.match(raw, at + len(item_key), end)
+                if value:
+                    values[item] = int(value.group(1))
+        stats[category] = values
+    return stats
+
+def parse_full(raw):
+    return json_loads(raw).get("stats", {})
+
+# Parser state for parse_stats_file(); set per process by init_parser()
+_parser = {"rules": {}, "extractor": []}
+
+def init_parser(compiled):
+    _parser["rules"] = compiled
+    _parser["extractor"] = compile_extractor(needed_paths(compiled))
+
+def parse_stats_file(job):
+    """Reads and evaluates one stats file. Runs inside pool workers, so it only
+    uses its arguments and the state set up by init_parser().
+
+    Returns (kind, uuid, payload):
+        ("ok", uuid, (harvest, progress, signature, rules_seconds))
+        ("unchanged", uuid, signature)   contents hash matches the last scan
+        ("error", uuid, message)
+    where signature is (file_name, mtime_ns, size, content_hash).
+    """
+    file, full_path, mtime_ns, size, prev_hash = job
+    uuid = file.replace(".json", "")
+    try:
+        with open(full_path, 'rb') as f:
+            raw = f.read()
+
+        content_hash = hashlib.sha1(raw).hexdigest() if SCAN_HASH else None
+        signature = (file, mtime_ns, size, content_hash)
+        if content_hash and content_hash == prev_hash:
+            # Touched but identical: only the signature needs refreshing
+            return ("unchanged", uuid, signature)
+
+        partial = SCAN_PARSER == "partial" or (SCAN_PARSER == "auto" and size >= PARTIAL_MIN_BYTES)
+        stats = extract_stats(raw, _parser["extractor"]) if partial else None
+        if stats is None:
+            stats = parse_full(raw)
+        started = time.perf_counter()
+        progress = evaluate_rules(_parser["rules"], stats)
+        return ("ok", uuid, (harvest_stats(stats), progress, signature, time.perf_counter() - started))
+    except Exception as e:
+        return ("error", uuid, str(e))
+
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def parse_files(jobs, compiled):
+    """Yields parse_stats_file() results, fanning out to SCAN_WORKERS processes for big passes"""
+    if SCAN_WORKERS > 1 and len(jobs) >= PARALLEL_MIN_FILES:
+        # Not forked: the scanner runs the status poller, exporter and source threads, and a
+        # fork could copy a lock one of them holds. The workers get all they need from initargs.
+        with ProcessPoolExecutor(SCAN_WORKERS, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                 initializer=init_parser, initargs=(compiled,)) as pool:
+            yield from pool.map(parse_stats_file, jobs, chunksize=32)
+    else:
+        init_parser(compiled)
+        for job in jobs:
+            yield parse_stats_file(job)
+
+def load_rows(cursor, sql, uuids, args=()):
+    """Runs `sql` (with an IN ({}) placeholder on player_uuid) for any number of players"""
+    rows = []
+    for chunk in chunked(list(uuids)):
+        cursor.execute(sql.format(','.join('?' * len(chunk))), list(args) + chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def load_manifest(cursor, source, names=None):
+    """Returns {file_name: (mtime_ns, size, content_hash, rules_hash)} for one source, optionally only for `names`"""
+    sql = "SELECT file_name, mtime_ns, size, content_hash, rules_hash FROM scan_manifest WHERE source = ?"
+    if names is None:
+        cursor.execute(sql, (source,))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    manifest = {}
+    for chunk in chunked(list(names)):
+        cursor.execute(f"{sql} AND file_name IN ({','.join('?' * len(chunk))})", [source] + chunk)
+        manifest.update({row[0]: row[1:] for row in cursor.fetchall()})
+    return manifest
+
+def load_unlocks(cursor, uuids):
+    """Returns the set of (player_uuid, achievement_id) the given players already unlocked"""
+    return set(load_rows(cursor, "SELECT player_uuid, achievement_id FROM unlocks WHERE player_uuid IN ({})", uuids))
+
+def load_stats(cursor, uuids, source=None):
+    """Returns {(player_uuid, stat_name): value} for the given players: their totals, or one source's values"""
+    if source is None:
+        rows = load_rows(cursor, "SELECT player_uuid, stat_name, value FROM player_stats WHERE player_uuid IN ({})", uuids)
+    else:
+        rows = load_rows(cursor, "SELECT player_uuid, stat_name, value FROM source_stats WHERE source = ? AND player_uuid IN ({})", uuids, (source,))
+    return {(row[0], row[1]): row[2] for row in rows}
+
+def load_progress(cursor, uuids, source=None):
+    """Returns {(player_uuid, achievement_id): current_value} for the given players: their totals, or one source's values"""
+    if source is None:
+        rows = load_rows(cursor, "SELECT player_uuid, achievement_id, current_value FROM player_progress WHERE player_uuid IN ({})", uuids)
+    else:
+        rows = load_rows(cursor, "SELECT player_uuid, achievement_id, current_value FROM source_progress WHERE source = ? AND player_uuid IN ({})", uuids, (source,))
+    return {(row[0], row[1]): row[2] for row in rows}
+
+def write_results(cursor, source, rules, results, manifest_rows):
+    """Bulk-writes a batch of players parsed from one source.
+
+    `results` is a list of (uuid, harvest, progress) where harvest holds the
+    HARVEST values in order and progress is {rule_id: value}. The source's own
+    rows are replaced and the player totals (player_stats, player_progress) move
+    by the same difference, so other sources are never read.
+    Returns the list of new (uuid, rule_id) unlocks.
+    """
+    now = datetime.now()
+    thresholds = {rule[0]: rule[2] for rule in rules}
+    uuids = [r[0] for r in results]
+    source_stats, source_progress = load_stats(cursor, uuids, source), load_progress(cursor, uuids, source)
+    totals, total_progress = load_stats(cursor, uuids), load_progress(cursor, uuids)
+    unlocked = load_unlocks(cursor, uuids)
+
+    source_stat_rows, source_progress_rows = [], []
+    stat_rows, progress_rows, new_unlocks = [], [], []
+    source_changes, stat_changes = [], []
+    rescore = set()
+    for uuid, harvest, progress in results:
+        for (stat, _, _), value in zip(HARVEST, harvest):
+            old = source_stats.get((uuid, stat))
+            if old == value:
+                continue
+            old_total = totals.get((uuid, stat))
+            total = (old_total or 0) - (old or 0) + value
+            source_stat_rows.append((source, uuid, stat, value))
+            source_changes.append((uuid, stat, old, value))
+            stat_rows.append((uuid, stat, total, now))
+            stat_changes.append((uuid, stat, old_total, total))
+            if stat in NET_WORTH_STATS:
+                rescore.add(uuid)
+        for rule_id, val in progress.items():
+            total = total_progress.get((uuid, rule_id), 0)
+            # Only touch progress rows whose value actually moved
+            old = source_progress.get((uuid, rule_id))
+            if old != val:
+                total += val - (old or 0)
+                source_progress_rows.append((source, uuid, rule_id, val))
+                progress_rows.append((uuid, rule_id, total, now))
+            if total >= thresholds[rule_id] and (uuid, rule_id) not in unlocked:
+                new_unlocks.append((uuid, rule_id))
+                unlocked.add((uuid, rule_id))
+                rescore.add(uuid)
+
+    cursor.executemany('''
+        INSERT INTO source_stats (source, player_uuid, stat_name, value)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(source, player_uuid, stat_name) DO UPDATE SET value=excluded.value
+    ''', source_stat_rows)
+    cursor.executemany('''
+        INSERT INTO player_stats (player_uuid, stat_name, value, last_updated)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(player_uuid, stat_name) DO UPDATE SET
+            value=excluded.value,
+            last_updated=excluded.last_updated
+    ''', stat_rows)
+    # Deltas come from the source's own counters, so a reset on one server isn't mistaken for growth
+    history.record_changes(cursor, source_changes)
+    if stat_rows:
+        ranks.mark_dirty()
+
+    cursor.executemany('''
+        INSERT INTO source_progress (source, player_uuid, achievement_id, current_value)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(source, player_uuid, achievement_id) DO UPDATE SET current_value=excluded.current_value
+    ''', source_progress_rows)
+    cursor.executemany('''
+        INSERT INTO player_progress (player_uuid, achievement_id, current_value, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(player_uuid, achievement_id) DO UPDATE SET
+            current_value=excluded.current_value,
+            updated_at=excluded.updated_at
+    ''', progress_rows)
+
+    cursor.executemany("INSERT OR IGNORE INTO unlocks (player_uuid, achievement_id) VALUES (?, ?)", new_unlocks)
+    events.publish(cursor, feed_events(rules, new_unlocks, stat_changes))
+
+    # Manifest goes in the same transaction, so a crash never marks unwritten files as scanned
+    cursor.executemany('''
+        INSERT INTO scan_manifest (source, file_name, mtime_ns, size, content_hash, rules_hash, scanned_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source, file_name) DO UPDATE SET
+            mtime_ns=excluded.mtime_ns,
+            size=excluded.size,
+            content_hash=excluded.content_hash,
+            rules_hash=excluded.rules_hash,
+            scanned_at=excluded.scanned_at
+    ''', manifest_rows)
+
+    refresh_scores(cursor, rescore)
+    if stat_rows or progress_rows or new_unlocks:
+        bump_generation(cursor)
+        mark_changed(cursor, {row[0] for row in stat_rows} | {row[0] for row in progress_rows} | rescore)
+
+    for table, rows in (("source_stats", source_stat_rows), ("player_stats", stat_rows), ("source_progress", source_progress_rows), ("player_progress", progress_rows),
+                        ("unlocks", new_unlocks), ("scan_manifest", manifest_rows), ("player_scores", rescore)):
+        metrics.inc("corex_scan_rows_written_total", len(rows), table=table)
+    return new_unlocks
+
+# Sources are scanned in parallel threads, each on its own connection; writes take turns
+# so every batch reads the player totals the previous one committed
+_write_lock = threading.Lock()
+
+def flush_results(conn, source, rules, results, manifest_rows, timings):
+    """Writes and commits one batch, then announces its unlocks. Time spent is added to `timings`."""
+    cursor = conn.cursor()
+    with metrics.stopwatch(timings, "lock"):
+        _write_lock.acquire()
+    try:
+        with metrics.stopwatch(timings, "write"):
+            new_unlocks = write_results(cursor, source, rules, results, manifest_rows)
+        with metrics.stopwatch(timings, "commit"):
+            conn.commit()
+    except Exception:
+        conn.rollback() # Before another source takes the lock
+        raise
+    finally:
+        _write_lock.release()
+    metrics.inc("corex_scan_unlocks_total", len(new_unlocks))
+    if new_unlocks:
+        log_unlocks(rules, new_unlocks)
+
+def refresh_scores(cursor, uuids):
+    """Recomputes the player_scores rows (and the server total) for the given players"""
+    uuids = list(uuids)
+    if not uuids:
         return
 
+    now = datetime.now()
+    rows = []
+    for chunk in chunked(uuids):
+        marks = ','.join('?' * len(chunk))
+        cursor.execute(f'''
+            SELECT u.player_uuid, SUM(d.points), COUNT(*)
+            FROM unlocks u JOIN definitions d ON u.achievement_id = d.id
+            WHERE u.player_uuid IN ({marks}) GROUP BY u.player_uuid
+        ''', chunk)
+        scores = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        wealth = {}
+        cursor.execute(f"SELECT player_uuid, stat_name, value FROM player_stats WHERE player_uuid IN ({marks}) AND stat_name IN ({','.join('?' * len(NET_WORTH_STATS))})", chunk + sorted(NET_WORTH_STATS))
+        for uuid, stat, value in cursor.fetchall():
+            wealth.setdefault(uuid, {})[stat] = value
+
+        for uuid in chunk:
+            score, unlock_count = scores.get(uuid, (0, 0))
+            rows.append((uuid, score, unlock_count, calculate_net_worth(wealth.get(uuid, {})), rank_tier(score), now))
+
+    cursor.executemany('''
+        INSERT INTO player_scores (player_uuid, score, unlock_count, net_worth, rank_tier, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(player_uuid) DO UPDATE SET
+            score=excluded.score,
+            unlock_count=excluded.unlock_count,
+            net_worth=excluded.net_worth,
+            rank_tier=excluded.rank_tier,
+            updated_at=excluded.updated_at
+    ''', rows)
+
+    # The era total and the GDP are read on every dashboard hit, so keep them as a single row.
+    # The GDP counts every stats file, including players missing from the usercache.
+    cursor.execute('''
+        UPDATE server_summary SET
+            (total_score, gdp) = (SELECT COALESCE(SUM(CASE WHEN p.uuid IS NOT NULL THEN s.score END), 0), COALESCE(SUM(s.net_worth), 0)
+                                  FROM player_scores s LEFT JOIN players p ON p.uuid = s.player_uuid),
+            updated_at = ?
+        WHERE id = 1
+    ''', (now,))
+
+def backfill_scores(cursor):
+    """Gives every known player a current player_scores row (new identities, first run on an
+    old DB) and recomputes rows marked stale by sync_definitions() or check_ore_prices(),
+    including players missing from the usercache, whose rows still count toward the GDP"""
+    cursor.execute('''
+        SELECT player_uuid FROM player_scores WHERE updated_at IS NULL
+        UNION
+        SELECT p.uuid FROM players p LEFT JOIN player_scores s ON s.player_uuid = p.uuid WHERE s.player_uuid IS NULL
+    ''')
+    missing = [row[0] for row in cursor.fetchall()]
+    if missing:
+        refresh_scores(cursor, missing)
+        bump_generation(cursor)
+        mark_changed(cursor, missing)
+
+def check_ore_prices(cursor):
+    """Marks every score stale when ORE_PRICES differ from the prices the stored net worths used"""
+    prices = json.dumps(ORE_PRICES, sort_keys=True)
+    if cursor.execute("SELECT ore_prices FROM server_summary WHERE id = 1").fetchone()[0] == prices:
+        return
+    cursor.execute("UPDATE player_scores SET updated_at = NULL")
+    cursor.execute("UPDATE server_summary SET ore_prices = ? WHERE id = 1", (prices,))
+
+def bump_generation(cursor):
+    """Marks the data as changed; the web tier's page cache is keyed on this counter"""
+    cursor.execute("UPDATE server_summary SET scan_generation = scan_generation + 1, generation_at = ? WHERE id = 1", (time.time(),))
+
+def mark_changed(cursor, uuids):
+    """Stamps players whose profile shows new data with the current generation (after bump_generation())"""
+    for chunk in chunked(list(uuids)):
+        cursor.execute(f"UPDATE players SET changed_generation = (SELECT scan_generation FROM server_summary WHERE id = 1) WHERE uuid IN ({','.join('?' * len(chunk))})", chunk)
+
+def feed_events(rules, new_unlocks, stat_changes):
+    """Live-feed events for a batch: one per unlock, and one per player whose stats moved.
+
+    Players seen for the first time are left out, like in the history, so a
+    cold scan doesn't flood the feed with every unlock ever earned.
+    """
+    changed, first_seen = {}, set()
+    for uuid, stat, old, new in stat_changes:
+        if old is None:
+            first_seen.add(uuid)
+        else:
+            changed.setdefault(uuid, {})[stat] = new
+    first_seen -= changed.keys()
+
+    gamertags = _identities["names"] or {}
+    rule_info = {rule[0]: rule for rule in rules}
+    feed = []
+    for uuid, rule_id in new_unlocks:
+        if uuid in first_seen:
+            continue
+        _, name, _, _, icon = rule_info[rule_id]
+        feed.append((events.UNLOCK, uuid, {"uuid": uuid, "name": gamertags.get(uuid) or uuid[:8], "achievement": rule_id, "title": name, "icon": icon}))
+    for uuid, stats in changed.items():
+        feed.append((events.STATS, uuid, {"uuid": uuid, "name": gamertags.get(uuid) or uuid[:8], "stats": stats}))
+    return feed
+
+def log_unlocks(rules, new_unlocks):
+    names = {rule[0]: rule[1] for rule in rules}
+    gamertags = _identities["names"] or {}
+    for uuid, rule_id in new_unlocks:
+        print(f"   🏆 UNLOCKED: {names[rule_id]} for {gamertags.get(uuid) or uuid[:8]}")
+
+# Signature (mtime_ns, size) of the achievements.yaml last applied by this process
+_achievements = {"signature": None}
+
+def reload_achievements(cursor):
+    """Applies achievements.yaml to the definitions when the file changed since the last pass.
+
+    Checked on every pass, so edits take effect without a restart. Threshold,
+    point and new-rule changes are applied from stored progress; only stats no
+    rule read before force stats files to be re-read. Returns True if definitions changed.
+    """
     try:
-        with open(USERCACHE_PATH, 'r') as f:
-            users = json.load(f)
-            
-        for u in users:
-            cursor.execute('''
-            INSERT INTO players (uuid, gamertag, last_seen) 
-            VALUES (?, ?, ?)
-            ON CONFLICT(uuid) DO UPDATE SET gamertag=excluded.gamertag
-            ''', (u['uuid'], u['name'], datetime.now()))
+        st = os.stat(ACHIEVEMENTS_PATH)
+    except FileNotFoundError:
+        return False
+    signature = (st.st_mtime_ns, st.st_size)
+    if signature == _achievements["signature"]:
+        return False
+
+    try:
+        rows = load_achievements()
+    except Exception as e:
+        print(f"❌ Achievements Reload Error: {e} (keeping the current definitions)")
+        metrics.inc("corex_scan_errors_total", stage="achievements")
+        _achievements["signature"] = signature # Wait for the next edit
+        return False
+
+    cursor.execute("SELECT stat_key FROM definitions")
+    old_keys = [row[0] for row in cursor.fetchall()]
+    changes = sync_definitions(cursor, rows, HARVEST_KEYS)
+    _achievements["signature"] = signature
+    if changes is None:
+        return False
+
+    if not changes["unresolved"]:
+        # Every rule's values are already stored, so files scanned under the old rules stay valid
+        new_keys = [row[3] for row in rows]
+        cursor.execute("UPDATE scan_manifest SET rules_hash = ? WHERE rules_hash = ?", (stat_keys_fingerprint(new_keys), stat_keys_fingerprint(old_keys)))
+    else:
+        print(f"🔁 Re-reading stats files for new rules: {', '.join(changes['unresolved'])}")
+    backfill_scores(cursor)
+    bump_generation(cursor)
+    return True
+
+# Identity state kept between passes: the usercache.json signatures last synced and uuid -> gamertag
+_identities = {"signature": None, "names": None}
+
+def reset_identities():
+    """Forgets the cached identities (after a rolled-back pass) so the next sync starts from the DB"""
+    _identities["signature"] = None
+    _identities["names"] = None
+
+def sync_identities(cursor):
+    """Reads every source's Minecraft usercache.json to map UUIDs to Names.
+
+    Skipped while the files' mtime/size are unchanged; otherwise only new or
+    renamed players are written. Returns the list of UUIDs that changed.
+    """
+    if _identities["names"] is None:
+        cursor.execute("SELECT uuid, gamertag FROM players")
+        _identities["names"] = dict(cursor.fetchall())
+    names = _identities["names"]
+
+    signature = []
+    for path in USERCACHE_PATHS:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    if not signature:
+        return []
+    signature = tuple(signature)
+    if signature == _identities["signature"]:
+        return []
+
+    try:
+        users = {}
+        for path, _, _ in signature:
+            with open(path, 'r') as f:
+                for u in json.load(f):
+                    # Known to several servers: the latest expiry is the latest login, so the current name
+                    if u['uuid'] not in users or u.get('expiresOn', '') > users[u['uuid']].get('expiresOn', ''):
+                        users[u['uuid']] = u
+
+        now = datetime.now()
+        changed = [(u['uuid'], u['name'], now) for u in users.values() if names.get(u['uuid']) != u['name']]
+        cursor.executemany('''
+        INSERT INTO players (uuid, gamertag, last_seen) 
+        VALUES (?, ?, ?)
+        ON CONFLICT(uuid) DO UPDATE SET gamertag=excluded.gamertag
+        ''', changed)
+
+        names.update((uuid, name) for uuid, name, _ in changed)
+        _identities["signature"] = signature
+        return [uuid for uuid, _, _ in changed]
             
     except Exception as e:
         print(f"❌ Identity Sync Error: {e}")
+        metrics.inc("corex_scan_errors_total", stage="identity")
+        return []
+
+def scan_source(source, stats_path, uuids, rules, compiled, rules_hash):
+    """Scans one source's stats directory on its own connection.
+
+    With `uuids` only those players' stats files are considered (used by watch mode);
+    otherwise the whole directory is listed. Returns (counts, timings).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    counts = {"processed": 0, "skipped": 0, "errors": 0}
+    timings = {}
+    started = time.perf_counter()
+    label = f" [{source}]" if len(SOURCES) > 1 else ""
+
+    try:
+        if not os.path.exists(stats_path):
+            return counts, timings
+
+        with metrics.stopwatch(timings, "list"):
+            # 4. Load Manifest (Skip files that haven't changed since the last pass)
+            if uuids is None:
+                entries = [(e.name, e.path) for e in os.scandir(stats_path) if e.name.endswith(".json")]
+                manifest = load_manifest(cursor, source)
+
+                # Forget files that disappeared (e.g. world reset) so they get re-read if they come back
+                gone = manifest.keys() - {name for name, _ in entries}
+                if gone:
+                    with _write_lock:
+                        cursor.executemany("DELETE FROM scan_manifest WHERE source = ? AND file_name = ?", [(source, name) for name in gone])
+                        conn.commit()
+            else:
+                entries = [(f"{u}.json", os.path.join(stats_path, f"{u}.json")) for u in uuids]
+                manifest = load_manifest(cursor, source, [name for name, _ in entries])
 
-def scan_sector():
+            # 5. Stat files and queue the ones whose signature changed
+            jobs = []
+            for file, full_path in entries:
+                try:
+                    st = os.stat(full_path)
+                except FileNotFoundError:
+                    continue # Event for a file that's already gone
+                prev = manifest.get(file)
+                if prev and prev[0] == st.st_mtime_ns and prev[1] == st.st_size and prev[3] == rules_hash:
+                    counts["skipped"] += 1
+                    continue
+                prev_hash = prev[2] if prev and prev[3] == rules_hash else None
+                jobs.append((file, full_path, st.st_mtime_ns, st.st_size, prev_hash))
+
+        # 6. Parse (in worker processes for big passes) and stream results into the shared writer
+        parse_started = time.perf_counter()
+        results, manifest_rows = [], []
+        for kind, uuid, payload in parse_files(jobs, compiled):
+            if kind == "error":
+                counts["errors"] += 1
+                print(f"❌ Error scanning {uuid}{label}: {payload}")
+                continue
+
+            if kind == "unchanged":
+                counts["skipped"] += 1
+                signature = payload
+            else:
+                counts["processed"] += 1
+                harvest, progress, signature, rules_seconds = payload
+                timings["rules"] = timings.get("rules", 0.0) + rules_seconds
+                results.append((uuid, harvest, progress))
+            manifest_rows.append((source,) + signature + (rules_hash, datetime.now()))
+
+            if len(manifest_rows) >= SCAN_BATCH_SIZE:
+                flush_results(conn, source, rules, results, manifest_rows, timings)
+                results, manifest_rows = [], []
+        # Batches flushed mid-loop were timed as lock/write/commit; the rest was reading files.
+        # Rule evaluation happens inside parsing (possibly in workers) and is summed separately.
+        timings["parse"] = time.perf_counter() - parse_started - sum(timings.get(phase, 0.0) for phase in ("lock", "write", "commit"))
+
+        flush_results(conn, source, rules, results, manifest_rows, timings)
+
+        if counts["processed"] or counts["errors"]:
+            print(f"📊 Scan Pass{label}: {counts['processed']} processed, {counts['skipped']} skipped, {counts['errors']} errors")
+    except Exception as e:
+        # Only this source's uncommitted batch is lost; the others carry on
+        print(f"❌ Scan Error{label}: {e}")
+        metrics.inc("corex_scan_errors_total", stage="pass")
+    finally:
+        conn.close()
+        metrics.observe("corex_scan_source_seconds", time.perf_counter() - started, source=source)
+    return counts, timings
+
+def scan_sector(changes=None):
+    """Runs one scan pass. Returns file counters (processed / skipped / errors) summed over sources.
+
+    With `changes` = {source: uuids} only those players' stats files are considered (used by
+    watch mode); otherwise every source's directory is listed. Sources are scanned in parallel
+    threads. Phase timings (summed over sources) and counters go to metrics.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
+    counts = {}
+    timings = {}
+    started = time.perf_counter()
     
     try:
         # 1. Upgrade DB Structure (Safety check)
         init_tables(cursor)
         
-        # 2. Sync Names
-        sync_identities(cursor)
-        conn.commit()
-
-        # 3. Get Rules for Achievements
-        cursor.execute("SELECT id, name, threshold, stat_key, icon FROM definitions")
-        rules = cursor.fetchall()
+        # 2. Sync Names (and score any player we haven't seen yet)
+        with metrics.stopwatch(timings, "identity"):
+            first_sync = _identities["names"] is None
+            if first_sync:
+                check_ore_prices(cursor)
+            renamed = sync_identities(cursor)
+            if renamed:
+                backfill_scores(cursor)
+                bump_generation(cursor) # Renames show up on every page
+                mark_changed(cursor, renamed)
+            elif first_sync:
+                backfill_scores(cursor)
 
-        if not os.path.exists(STATS_PATH):
-            return
+        # 3. Re-seed the definitions if achievements.yaml was edited
+        with metrics.stopwatch(timings, "definitions"):
+            reload_achievements(cursor)
 
-        files = [f for f in os.listdir(STATS_PATH) if f.endswith(".json")]
+        with metrics.stopwatch(timings, "list"):
+            # Get Rules for Achievements
+            cursor.execute("SELECT id, name, threshold, stat_key, icon FROM definitions")
+            rules = cursor.fetchall()
+            rules_hash = stat_keys_fingerprint(rule[3] for rule in rules)
+            compiled = get_compiled_rules(rules, rules_fingerprint(rules))
+        conn.commit() # The sources write through their own connections
 
-        for file in files:
-            uuid = file.replace(".json", "")
-            full_path = os.path.join(STATS_PATH, file)
-            
-            try:
-                with open(full_path, 'r') as f:
-                    data = json.load(f)
-                
-                # --- PART A: GLOBAL STAT HARVEST (For Leaderboards) ---
-                custom_stats = data.get("stats", {}).get("minecraft:custom", {})
-                mined_stats = data.get("stats", {}).get("minecraft:mined", {})
-                
-                # 1. Mob Kills (Handle missing key)
-                total_kills = custom_stats.get("minecraft:mob_kills", 0)
-                # 2. Deaths (Handle missing key)
-                total_deaths = custom_stats.get("minecraft:deaths", 0)
-                # 3. Play Time (FIXED KEY: play_time instead of play_one_minute)
-                play_time = custom_stats.get("minecraft:play_time", 0)
-                # 4. Walk Distance
-                dist_walked = custom_stats.get("minecraft:walk_one_cm", 0)
-
-                harvest_data = [
-                    (uuid, 'total_kills', total_kills),
-                    (uuid, 'total_deaths', total_deaths),
-                    (uuid, 'play_time_ticks', play_time),
-                    (uuid, 'distance_walked', dist_walked),
-                    (uuid, 'mined_ancient_debris', mined_stats.get('minecraft:ancient_debris', 0)),
-                    (uuid, 'mined_diamond_ore', mined_stats.get('minecraft:diamond_ore', 0)),
-                    (uuid, 'mined_deepslate_diamond_ore', mined_stats.get('minecraft:deepslate_diamond_ore', 0)),
-                    (uuid, 'mined_emerald_ore', mined_stats.get('minecraft:emerald_ore', 0)),
-                    (uuid, 'mined_deepslate_emerald_ore', mined_stats.get('minecraft:deepslate_emerald_ore', 0)),
-                    (uuid, 'mined_gold_ore', mined_stats.get('minecraft:gold_ore', 0)),
-                    (uuid, 'mined_deepslate_gold_ore', mined_stats.get('minecraft:deepslate_gold_ore', 0))
-                ]
-
-                cursor.executemany('''
-                    INSERT INTO player_stats (player_uuid, stat_name, value, last_updated)
-                    VALUES (?, ?, ?, ?)
-                    ON CONFLICT(player_uuid, stat_name) DO UPDATE SET
-                        value=excluded.value,
-                        last_updated=excluded.last_updated
-                ''', [(h[0], h[1], h[2], datetime.now()) for h in harvest_data])
-
-                # --- PART B: ACHIEVEMENT SCANNING ---
-                # Fetch Name for logging
-                cursor.execute("SELECT gamertag FROM players WHERE uuid=?", (uuid,))
-                result = cursor.fetchone()
-                player_name = result[0] if result else uuid[:8]
-                
-                # Need to look at ROOT stats for accurate mining/crafting checks
-                # Helper to find deeply nested keys safely
-                def get_stat_value(stat_path):
-                    parts = stat_path.split(":")
-                    # e.g. minecraft:mined:minecraft:stone -> ["minecraft", "mined", "minecraft", "stone"]
-                    # But JSON structure is stats -> minecraft:mined -> minecraft:stone
-                    # We need to map the DB key format to the JSON format
-                    
-                    # Case 1: Custom Stats (minecraft:mob_kills)
-                    if len(parts) == 2: 
-                        return custom_stats.get(stat_path, 0)
-                    
-                    # Case 2: Block/Item Stats (minecraft:mined:minecraft:stone)
-                    # The DB key is often "minecraft:mined:minecraft:stone"
-                    # The JSON is data["stats"]["minecraft:mined"]["minecraft:stone"]
-                    category = parts[0] + ":" + parts[1] # "minecraft:mined"
-                    item = parts[2] + ":" + parts[3]     # "minecraft:stone"
-                    
-                    return data.get("stats", {}).get(category, {}).get(item, 0)
-
-                for (rule_id, name, threshold, key, icon) in rules:
-                    # Use the helper to find the value regardless of category
-                    val = get_stat_value(key)
-                    
-                    # Update Progress
-                    cursor.execute('''
-                        INSERT INTO player_progress (player_uuid, achievement_id, current_value, updated_at)
-                        VALUES (?, ?, ?, ?)
-                        ON CONFLICT(player_uuid, achievement_id) DO UPDATE SET
-                            current_value=excluded.current_value,
-                            updated_at=excluded.updated_at
-                    ''', (uuid, rule_id, val, datetime.now()))
-
-                    # Check Logic for Unlock
-                    cursor.execute("SELECT 1 FROM unlocks WHERE player_uuid=? AND achievement_id=?", (uuid, rule_id))
-                    if cursor.fetchone(): continue # Skip if done
-
-                    if val >= threshold:
-                        print(f"   🏆 UNLOCKED: {name} for {player_name}")
-                        cursor.execute("INSERT INTO unlocks (player_uuid, achievement_id) VALUES (?, ?)", (uuid, rule_id))
-                        conn.commit()
+        # 4-6. Every source (or those with changed files) in its own thread
+        targets = [(source, path, None if changes is None else changes[source])
+                   for source, path, _ in SOURCES if changes is None or changes.get(source)]
+        if len(targets) > 1:
+            with ThreadPoolExecutor(len(targets), thread_name_prefix="scan") as pool:
+                scanned = list(pool.map(lambda target: scan_source(*target, rules, compiled, rules_hash), targets))
+        else:
+            scanned = [scan_source(*target, rules, compiled, rules_hash) for target in targets]
+        for (source, _, _), (source_counts, source_timings) in zip(targets, scanned):
+            counts[source] = source_counts
+            for phase, seconds in source_timings.items():
+                timings[phase] = timings.get(phase, 0.0) + seconds
 
-            except Exception as e:
-                print(f"❌ Error scanning {uuid}: {e}")
-
-        conn.commit()
+        # 7. Roll old history up into hourly/daily buckets (hourly at most), re-rank changed
+        # leaderboard stats (every RANKS_INTERVAL at most), expire old feed events
+        with metrics.stopwatch(timings, "maintenance"):
+            history.maybe_compact(cursor)
+            if ranks.maybe_refresh(cursor, [stat['name'] for stat in LEADERBOARDS]):
+                bump_generation(cursor)
+            events.prune(cursor)
+            conn.commit()
+        export.notify() # The exporter thread (EXPORT_DIR) renders what this pass changed
     except Exception as e:
         print(f"❌ Scan Error: {e}")
+        metrics.inc("corex_scan_errors_total", stage="pass")
+        reset_identities() # The uncommitted name changes were rolled back
+        _achievements["signature"] = None # ...and so were any definition changes
+        ranks.mark_dirty()                # ...and any rank refresh
     finally:
         conn.close()
+        record_pass(counts, timings, time.perf_counter() - started)
+    return {result: sum(c[result] for c in counts.values()) for result in ("processed", "skipped", "errors")}
 
-def run_loop():
-    print("🚀 Scanner Loop Initiated")
+def record_pass(counts, timings, elapsed):
+    """`counts` is {source: {result: files}}"""
+    metrics.inc("corex_scan_passes_total")
+    for source, source_counts in counts.items():
+        for result, n in source_counts.items():
+            metrics.inc("corex_scan_files_total", n, source=source, result=result)
+        metrics.inc("corex_scan_errors_total", source_counts["errors"], stage="parse")
+    for phase, seconds in timings.items():
+        metrics.observe("corex_scan_phase_seconds", seconds, phase=phase)
+    metrics.observe("corex_scan_pass_seconds", elapsed)
+    metrics.set_gauge("corex_scan_last_pass_timestamp_seconds", time.time())
+    metrics.flush(force=True)
+
+def poll_loop():
     while True:
         scan_sector()
         time.sleep(SCAN_INTERVAL)
 
+def collect_changes(watcher):
+    """Blocks until stats files change, then debounces the burst.
+
+    Returns {source: set of changed UUIDs}, or None when a full pass is needed
+    (periodic resync or lost events).
+    """
+    names, overflow = watcher.read(WATCH_RESYNC)
+    if not names and not overflow:
+        return None # Quiet period: safety-net full pass
+
+    # Minecraft flushes every online player at once; keep collecting until it goes quiet
+    changed = set(names)
+    deadline = time.monotonic() + WATCH_DEBOUNCE * 10
+    while not overflow and time.monotonic() < deadline:
+        more, overflow = watcher.read(WATCH_DEBOUNCE)
+        if not more:
+            break
+        changed.update(more)
+
+    if overflow:
+        return None
+    sources = {path: source for source, path, _ in SOURCES}
+    changes = {}
+    for path, name in changed:
+        if name.endswith(".json") and path in sources:
+            changes.setdefault(sources[path], set()).add(name[:-len(".json")])
+    return changes
+
+def watch_loop(watcher):
+    scan_sector() # Catch up on anything that changed while we were down
+    while True:
+        changes = collect_changes(watcher)
+        if changes is None:
+            scan_sector()
+        elif changes:
+            scan_sector(changes)
+
+def run_loop():
+    print("🚀 Scanner Loop Initiated")
+    start_poller()
+    if export.EXPORT_DIR:
+        export.start_exporter()
+    while True:
+        watcher = None
+        if SCAN_MODE == "watch":
+            try:
+                watcher = InotifyWatcher([path for _, path, _ in SOURCES])
+            except WatchUnavailable as e:
+                print(f"⚠️  Watch mode unavailable ({e}), falling back to polling every {SCAN_INTERVAL}s")
+
+        if watcher is None:
+            poll_loop()
+
+        print(f"👁️  Watching {', '.join(path for _, path, _ in SOURCES)} for changes")
+        try:
+            watch_loop(watcher)
+        except WatchUnavailable as e:
+            print(f"⚠️  Watch lost ({e}), re-arming")
+            time.sleep(SCAN_INTERVAL)
+        finally:
+            watcher.close()
+
+def drop_source(source):
+    """Deletes everything scanned from a source that was taken out of MINECRAFT_SOURCES and
+    subtracts its values from the player totals. Earned unlocks and past history are kept.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    players = [row[0] for row in cursor.execute("SELECT DISTINCT player_uuid FROM source_stats WHERE source = ?", (source,))]
+    cursor.execute('''
+        UPDATE player_stats SET value = player_stats.value - s.value FROM source_stats s
+        WHERE s.source = ? AND s.player_uuid = player_stats.player_uuid AND s.stat_name = player_stats.stat_name
+    ''', (source,))
+    cursor.execute('''
+        UPDATE player_progress SET current_value = player_progress.current_value - s.current_value FROM source_progress s
+        WHERE s.source = ? AND s.player_uuid = player_progress.player_uuid AND s.achievement_id = player_progress.achievement_id
+    ''', (source,))
+    for table in ("source_stats", "source_progress", "scan_manifest"):
+        cursor.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+    refresh_scores(cursor, players)
+    ranks.refresh(cursor, [stat['name'] for stat in LEADERBOARDS])
+    bump_generation(cursor)
+    mark_changed(cursor, players)
+    conn.commit()
+    conn.close()
+    print(f"🗑️  Source {source} dropped ({len(players)} players)")
+
 if __name__ == "__main__":
-    run_loop()
+    parser = argparse.ArgumentParser(description="Core-X stats scanner")
+    parser.add_argument("--drop-source", metavar="NAME", help="remove a source's data from the database and exit")
+    args = parser.parse_args()
+    if args.drop_source:
+        if args.drop_source in SOURCE_NAMES:
+            parser.error(f"{args.drop_source} is still listed in MINECRAFT_SOURCES and would be scanned again")
+        drop_source(args.drop_source)
+    else:
+        run_loop()
@@ -0,0 +1,60 @@
+# Core-X // Server Status Module
+# Polls the Minecraft server in the background and caches the result in the DB,
+# so web requests never wait on a network lookup.
+
+import os
+import time
+import threading
+from mcstatus import JavaServer
+import db
+import events
+
+# CONFIGURATION
+DB_NAME = os.getenv("DB_PATH", "corex.db")
+MC_SERVER_HOST = os.getenv("MC_SERVER_HOST", "localhost")
+MC_SERVER_PORT = int(os.getenv("MC_SERVER_PORT", 25565))
+STATUS_INTERVAL = int(os.getenv("STATUS_INTERVAL", 10))   # Seconds between polls
+STATUS_TTL = int(os.getenv("STATUS_TTL", 30))             # Older results are treated as Offline
+STATUS_TIMEOUT = float(os.getenv("STATUS_TIMEOUT", 2))
+
+def check_status():
+    """Returns (online, players_online, players_max)"""
+    try:
+        server = JavaServer.lookup(f"{MC_SERVER_HOST}:{MC_SERVER_PORT}", timeout=STATUS_TIMEOUT)
+        status = server.status()
+        return (1, status.players.online, status.players.max)
+    except Exception:
+        return (0, None, None)
+
+def poll_loop():
+    conn = db.connect(DB_NAME)
+    last = None
+    while True:
+        try:
+            state = check_status()
+            conn.execute('''
+                UPDATE server_status SET online=?, players_online=?, players_max=?, checked_at=?
+                WHERE id = 1
+            ''', state + (time.time(),))
+            if state != last:
+                # Lets open dashboards update the widget without reloading
+                events.publish(conn, [(events.STATUS, None, {"status": format_status(*state)})])
+                last = state
+            conn.commit()
+        except Exception as e:
+            print(f"❌ Status Poll Error: {e}")
+        time.sleep(STATUS_INTERVAL)
+
+def start_poller():
+    threading.Thread(target=poll_loop, name="status-poller", daemon=True).start()
+    print(f"📡 Polling {MC_SERVER_HOST}:{MC_SERVER_PORT} every {STATUS_INTERVAL}s")
+
+def read_status(conn):
+    """Formats the cached status for display; a stale or missing result means Offline"""
+    row = conn.execute("SELECT online, players_online, players_max, checked_at FROM server_status WHERE id = 1").fetchone()
+    if not row or row[3] is None or time.time() - row[3] > STATUS_TTL:
+        return "Offline"
+    return format_status(row[0], row[1], row[2])
+
+def format_status(online, players_online, players_max):
+    return f"Online ({players_online}/{players_max} Players)" if online else "Offline"
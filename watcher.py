@@ -0,0 +1,83 @@
+# Core-X // Watcher Module
+# Minimal inotify binding (Linux only) used by the scanner's watch mode.
+
+import os
+import ctypes
+import ctypes.util
+import select
+import struct
+
+# Event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+class WatchUnavailable(Exception):
+    """Raised when inotify can't be used (non-Linux, missing directory, watch limit reached)"""
+
+class InotifyWatcher:
+    """Watches directories for files that finished being written or were moved into them"""
+
+    def __init__(self, paths, mask=IN_CLOSE_WRITE | IN_MOVED_TO):
+        libc_name = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._init = libc.inotify_init1
+            self._add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError, TypeError) as e:
+            raise WatchUnavailable(f"inotify not supported: {e}")
+
+        self.paths = {} # watch descriptor -> directory
+        self.fd = self._init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise WatchUnavailable(os.strerror(ctypes.get_errno()))
+
+        for path in paths:
+            wd = self._add_watch(self.fd, os.fsencode(path), mask | IN_DELETE_SELF | IN_MOVE_SELF)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self.fd)
+                raise WatchUnavailable(f"{path}: {os.strerror(err)}")
+            self.paths[wd] = path
+
+    def read(self, timeout):
+        """Waits up to `timeout` seconds. Returns ([(directory, name), ...], overflow); overflow means events were lost."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+
+        names, overflow = [], False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    # The directory itself went away; the caller must fall back
+                    raise WatchUnavailable(f"{self.paths.get(wd, 'a watched directory')} was removed")
+                elif name:
+                    names.append((self.paths.get(wd), name))
+        return names, overflow
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass